@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# contour_data.py
+"""Benchmark ContourData decoding of a synthetic large RT Structure Set.
+
+Run from the repository root: python -m benchmarks.contour_data
+"""
+# Copyright (c) 2026 dicompyler-core contributors
+# This file is part of dicompyler-core, released under a BSD license.
+#    See the file license.txt included with this distribution, also
+#    available at https://github.com/dicompyler/dicompyler-core/
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from pydicom import dcmread
+from pydicom.dataset import Dataset
+from pydicom.sequence import Sequence
+from dicompylercore import dicomparser
+
+example_rtss = os.path.join(
+    os.path.dirname(__file__), os.pardir,
+    "tests", "testdata", "example_data", "rtss.dcm")
+
+
+def create_rtss(filename, rois, contours, points):
+    """Save an RT Structure Set with circular contours for every ROI."""
+    ds = dcmread(example_rtss)
+    angles = np.linspace(0, 2 * np.pi, points, endpoint=False)
+    sequence = []
+    for number in range(1, rois + 1):
+        roi = Dataset()
+        roi.ReferencedROINumber = number
+        roi.ContourSequence = Sequence()
+        for i in range(contours):
+            radius = 10 + number + (i % 7)
+            xyz = np.column_stack((
+                radius * np.cos(angles), radius * np.sin(angles),
+                np.full(points, -100 + 2.5 * i))).round(2)
+            contour = Dataset()
+            contour.ContourGeometricType = 'CLOSED_PLANAR'
+            contour.NumberOfContourPoints = points
+            contour.ContourData = ['%g' % v for v in xyz.ravel()]
+            roi.ContourSequence.append(contour)
+        sequence.append(roi)
+    ds.ROIContourSequence = Sequence(sequence)
+    ds.save_as(filename)
+
+
+def benchmark(filename, raw):
+    """Return the time to read the file and parse the geometry of all ROIs."""
+    start = time.perf_counter()
+    geometries = dicomparser.DicomParser(filename).GetStructureGeometries(
+        raw=raw)
+    elapsed = time.perf_counter() - start
+    return elapsed, geometries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rois', type=int, default=20)
+    parser.add_argument('--contours', type=int, default=100)
+    parser.add_argument('--points', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "rtss.dcm")
+        create_rtss(filename, args.rois, args.contours, args.points)
+        print("Synthetic RT Structure Set: %d ROIs, %d points, %.1f MB" % (
+            args.rois, args.rois * args.contours * args.points,
+            os.path.getsize(filename) / 2**20))
+
+        pydicom_time, expected = benchmark(filename, raw=False)
+        raw_time, geometries = benchmark(filename, raw=True)
+        for number, geometry in geometries.items():
+            assert np.array_equal(geometry.points, expected[number].points)
+        print("pydicom DSfloat decoding: %.3f s" % pydicom_time)
+        print("Raw NumPy decoding:       %.3f s (%.1fx)" % (
+            raw_time, pydicom_time / raw_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -14,21 +14,24 @@ import numpy as np
 try:
     from pydicom.dicomio import read_file
     from pydicom.dataset import Dataset, validate_file_meta
+    from pydicom.dataelem import RawDataElement
     from pydicom.pixel_data_handlers.util import pixel_dtype
 except ImportError:
     from dicom import read_file
     from dicom.dataset import Dataset
+    from dicom.dataelem import RawDataElement
 import random
+import struct
+from functools import lru_cache
 from numbers import Number
 from io import BytesIO
 from pathlib import Path
 from dicompylercore import dvh, util
-from dicompylercore.config import pil_available, shapely_available
+from dicompylercore.config import pil_available
+from dicompylercore.structure import StructureGeometry, parse_contour_data
 
 if pil_available:
     from PIL import Image
-if shapely_available:
-    from shapely.geometry import Polygon
 
 logger = logging.getLogger('dicompylercore.dicomparser')
 
@@ -54,6 +57,10 @@ class DicomParser:
             Raised if the DICOM file or pydicom Dataset cannot be read
         """
         self.memmap_pixel_array = memmap_pixel_array
+        # Pixel data is only decoded when the pixel array is first accessed
+        self._pixel_array = None
+        # Memoized results of dose grid geometry & pixel data calculations
+        self._cache = {}
         if isinstance(dataset, Dataset):
             self.ds = dataset
         elif isinstance(dataset, (str, BytesIO, Path)):
@@ -62,7 +69,7 @@ class DicomParser:
                     self.ds = read_file(fp, defer_size=100, force=True,
                                         stop_before_pixels=memmap_pixel_array)
                     if memmap_pixel_array:
-                        self.offset = fp.tell() + 8
+                        self.offset = self._get_pixel_data_offset(fp)
             except Exception:
                 # Raise the error for the calling method to handle
                 raise
@@ -92,10 +99,28 @@ class DicomParser:
             delattr(self.ds, 'PixelData')
         if memmap_pixel_array:
             self.filename = dataset
-            self.pixel_array = self.get_pixel_array
-        else:
-            if "PixelData" in self.ds:
-                self.pixel_array = self.ds.pixel_array
+
+    @property
+    def pixel_array(self):
+        """Return the pixel array, which is decoded on first access.
+
+        Raises
+        ------
+        AttributeError
+            Raised if the dataset does not contain pixel data
+        """
+        if self._pixel_array is None:
+            if self.memmap_pixel_array:
+                self._pixel_array = self.GetPixelArray()
+            elif "PixelData" in self.ds:
+                self._pixel_array = self.ds.pixel_array
+            else:
+                raise AttributeError("Dataset does not contain pixel data")
+        return self._pixel_array
+
+    @pixel_array.setter
+    def pixel_array(self, value):
+        self._pixel_array = value
 
 # ====================== SOP Class and Instance Methods ======================
 
@@ -250,29 +275,81 @@ class DicomParser:
         return data
 
     def GetPixelArray(self):
-        """Generate a memory mapped numpy accessor to the pixel array."""
-        if self.memmap_pixel_array is False:
+        """Generate a memory mapped numpy accessor to the pixel array.
+
+        The memory map is opened once and reused by subsequent calls.
+        """
+        if self.memmap_pixel_array is False or self._pixel_array is not None:
             return self.pixel_array
+        if self.offset is None:
+            raise AttributeError("Dataset does not contain pixel data")
         data = self.GetImageData()
-        filename = self.filename
-        dtype = pixel_dtype(self.ds)
-        offset = self.offset
         frames = int(data['frames'])
-        shape = (int(self.GetNumberOfFrames()),
-                 data['rows'], data['columns']) if frames > 1 \
+        shape = (frames, data['rows'], data['columns']) if frames > 1 \
             else (data['rows'], data['columns'])
+        self._pixel_array = np.memmap(
+            self.filename,
+            dtype=pixel_dtype(self.ds),
+            mode="r",
+            offset=self.offset,
+            shape=shape
+        )
+        return self._pixel_array
 
-        def get_pixel_array(filename, dtype, offset, shape):
-            array = np.memmap(
-                filename,
-                dtype=dtype,
-                mode="r",
-                offset=offset,
-                shape=shape
-            )
-            yield array
-            del array
-        return list(get_pixel_array(filename, dtype, offset, shape))[0]
+    def _get_pixel_data_offset(self, fp):
+        """Determine the file offset of the Pixel Data element value.
+
+        Parameters
+        ----------
+        fp : file
+            DICOM file positioned at the start of the Pixel Data element,
+            i.e. after reading the dataset with stop_before_pixels
+
+        Returns
+        -------
+        int or None
+            Offset of the Pixel Data value in bytes, or None if the file
+            does not contain pixel data
+
+        Raises
+        ------
+        NotImplementedError
+            Raised if the pixel data is not stored natively and uncompressed,
+            as it cannot be memory mapped
+        """
+        start = fp.tell()
+        header = fp.read(12)
+        if len(header) < 8:
+            return None
+        transfer_syntax = self.ds.file_meta.TransferSyntaxUID
+        if transfer_syntax.is_compressed or transfer_syntax.is_deflated:
+            raise NotImplementedError(
+                "Memory mapping is not supported for the transfer syntax: " +
+                transfer_syntax.name)
+        endian = '<' if transfer_syntax.is_little_endian else '>'
+        group, element = struct.unpack(endian + 'HH', header[0:4])
+        if (group, element) != (0x7fe0, 0x0010):
+            raise NotImplementedError(
+                "Memory mapping is only supported for the Pixel Data " +
+                "element, found (%04X,%04X)" % (group, element))
+        # Implicit VR: tag (4), length (4)
+        if transfer_syntax.is_implicit_VR:
+            length = struct.unpack(endian + 'L', header[4:8])[0]
+            value_offset = 8
+        # Explicit VR with a 4 byte length: tag (4), VR (2), reserved (2),
+        # length (4)
+        elif header[4:6] in (b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'UN'):
+            length = struct.unpack(endian + 'L', header[8:12])[0]
+            value_offset = 12
+        # Explicit VR with a 2 byte length: tag (4), VR (2), length (2)
+        else:
+            length = struct.unpack(endian + 'H', header[6:8])[0]
+            value_offset = 8
+        if length == 0xFFFFFFFF:
+            raise NotImplementedError(
+                "Memory mapping is not supported for encapsulated or " +
+                "undefined length pixel data")
+        return start + value_offset
 
     get_pixel_array = property(GetPixelArray)
 
@@ -324,13 +401,10 @@ class DicomParser:
         if 'NumberOfFrames' in self.ds:
             frames = self.ds.NumberOfFrames.real
         else:
+            # Pixel data without NumberOfFrames always decodes to a single
+            # frame, so the pixel array doesn't need to be decoded
             if "PixelData" not in self.ds:
                 return 0
-            else:
-                if (self.pixel_array.ndim > 2):
-                    if (self.ds.SamplesPerPixel == 1) and not \
-                       (self.ds.PhotometricInterpretation == 'RGB'):
-                        frames = self.pixel_array.shape[0]
         return frames
 
     def GetRescaleInterceptSlope(self):
@@ -402,9 +476,15 @@ class DicomParser:
             else:
                 pixel_array = self.pixel_array
 
-            rescaled_image = pixel_array * slope + intercept
-
-            image = self.GetLUTValue(rescaled_image, window, level)
+            # Integer pixel data is rendered by indexing a precomputed LUT
+            lut = get_window_level_lut(
+                window, level, slope, intercept, pixel_array.dtype)
+            if lut is not None:
+                image = lut[pixel_array.view(
+                    'u%d' % pixel_array.dtype.itemsize)]
+            else:
+                rescaled_image = pixel_array * slope + intercept
+                image = self.GetLUTValue(rescaled_image, window, level)
             im = Image.fromarray(image).convert('L')
 
         # Resize the image if a size is provided
@@ -420,8 +500,23 @@ class DicomParser:
 
         return im
 
-    def GetDefaultImageWindowLevel(self):
-        """Determine the default window/level for the DICOM image."""
+    def GetDefaultImageWindowLevel(self, frame=None):
+        """Determine the default window/level for the DICOM image.
+
+        If the window/level is not specified in the dataset, it is determined
+        from the range of the rescaled pixel values and memoized.
+
+        Parameters
+        ----------
+        frame : int, optional
+            If multi-frame, determine the range of the requested frame,
+            by default the range of all frames
+
+        Returns
+        -------
+        tuple
+            Window and level
+        """
         window, level = 0, 0
         if ('WindowWidth' in self.ds) and ('WindowCenter' in self.ds):
             if isinstance(self.ds.WindowWidth, float):
@@ -436,20 +531,26 @@ class DicomParser:
                     level = self.ds.WindowCenter[1]
 
         if ((window, level) == (0, 0)):
-            wmax = 0
-            wmin = 0
             # Rescale the slope and intercept of the image if present
             intercept, slope = self.GetRescaleInterceptSlope()
-            pixel_array = self.pixel_array * slope + intercept
-
-            if (pixel_array.max() > wmax):
-                wmax = pixel_array.max()
-            if (pixel_array.min() < wmin):
-                wmin = pixel_array.min()
+            pixel_array = self.pixel_array
+            key = ('window_level', frame, intercept, slope)
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] is pixel_array:
+                return cached[1]
+            if frame is not None:
+                pixel_array = pixel_array[frame]
+            # Rescale the extrema of the stored values instead of the array,
+            # which are swapped if the slope is negative
+            extrema = (pixel_array.min() * slope + intercept,
+                       pixel_array.max() * slope + intercept)
+            wmax = max(max(extrema), 0)
+            wmin = min(min(extrema), 0)
             # Default window is the range of the data array
             window = int(wmax - wmin)
             # Default level is the range midpoint minus the window minimum
             level = int(window / 2 - abs(wmin))
+            self._cache[key] = (self.pixel_array, (window, level))
         return window, level
 
     def GetLUTValue(self, data, window, level):
@@ -469,16 +570,7 @@ class DicomParser:
         numpy array
             Modified numpy array with RGB LUT applied
         """
-        lutvalue = util.piecewise(
-            data,
-            [data <= (level - 0.5 - (window - 1) / 2),
-             data > (level - 0.5 + (window - 1) / 2)],
-            [0, 255, lambda data:
-             ((data - (level - 0.5)) / (window-1) + 0.5) *
-             (255 - 0)])
-        # Convert the resultant array to an unsigned 8-bit array to create
-        # an 8-bit grayscale LUT since the range is only from 0 to 255
-        return np.array(lutvalue, dtype=np.uint8)
+        return apply_window_level(data, window, level)
 
     def GetPatientToPixelLUT(self):
         """Get image transformation matrix from the DICOM standard.
@@ -492,6 +584,12 @@ class DicomParser:
         num_cols = self.ds.Columns
         num_rows = self.ds.Rows
 
+        # Return the LUT if it was already calculated for this geometry
+        key = ('lut', drow, dcol, tuple(orientation),
+               first_x, first_y, first_z, num_cols, num_rows)
+        if key in self._cache:
+            return self._cache[key]
+
         # Determine which way X and Y real-world coords run
         # X runs across columns if x_lut_index is 0
         # limits to head-first/feet-first and prone/supine/decubitus
@@ -515,6 +613,11 @@ class DicomParser:
             col_lut = np.linspace(first_y, last_y, num_cols)
             row_lut = np.linspace(first_x, last_x, num_rows)
 
+        # The LUT is shared by subsequent calls so it must not be modified
+        col_lut.flags.writeable = False
+        row_lut.flags.writeable = False
+        self._cache[key] = col_lut, row_lut
+
         return col_lut, row_lut
 
 # ========================= RT Structure Set Methods =========================
@@ -604,35 +707,100 @@ class DicomParser:
         dict
             Dict of structure coordinates sorted by slice position (z)
         """
-        planes = {}
-        # The coordinate data of each ROI is stored within ROIContourSequence
-        if 'ROIContourSequence' in self.ds:
-            for roi in self.ds.ROIContourSequence:
-                if (roi.ReferencedROINumber == int(roi_number)):
-                    if 'ContourSequence' in roi:
-                        # Locate the contour sequence for each referenced ROI
-                        for c in roi.ContourSequence:
-                            # For each plane, initialize a new plane dict
-                            plane = dict()
-
-                            # Determine all the plane properties
-                            plane['type'] = c.ContourGeometricType
-                            plane['num_points'] = int(c.NumberOfContourPoints)
-                            # Since DICOM RT Structure Set (C.8.8.6) specifies
-                            # that a ContourData is stored as an flattened list
-                            # of xyz triples, convert it to a unflattened list
-                            # for easier parsing
-                            plane['data'] = \
-                                self.GetContourPoints(c.ContourData)
-
-                            # Add each plane to the planes dict
-                            # of the current ROI
-                            z = str(round(plane['data'][0][2], 2)) + '0'
-                            if z not in planes:
-                                planes[z] = []
-                            planes[z].append(plane)
+        return self.GetStructureGeometry(roi_number).to_dict()
 
-        return planes
+    def GetStructureGeometry(self, roi_number, raw=True):
+        """Get the contour geometry of the structure as contiguous arrays.
+
+        Parameters
+        ----------
+        roi_number : integer
+            ROI number used to index structure from RT Struct
+        raw : bool, optional
+            Parse the undecoded ContourData values directly with NumPy
+            instead of converting them to DSfloat values via pydicom,
+            by default True
+
+        Returns
+        -------
+        StructureGeometry
+            Contour points, offsets and bounding boxes of the structure,
+            accessed as a mapping of slice position (z) to contour arrays
+        """
+        contours = []
+        for roi in self._get_roi_contour_index().get(int(roi_number), []):
+            if 'ContourSequence' in roi:
+                # Since DICOM RT Structure Set (C.8.8.6) specifies that a
+                # ContourData is stored as an flattened list of xyz triples,
+                # collect it as an (n, 3) array
+                contours.extend(
+                    (c.ContourGeometricType, self._get_contour_data(c, raw))
+                    for c in roi.ContourSequence if 'ContourData' in c)
+
+        return StructureGeometry.from_contours(contours)
+
+    def GetStructureGeometries(self, roi_numbers=None, raw=True):
+        """Get the contour geometry of multiple structures in a single pass.
+
+        Parameters
+        ----------
+        roi_numbers : iterable, optional
+            ROI numbers used to index structures from RT Struct. If not
+            provided, all structures with contour data are returned.
+        raw : bool, optional
+            Parse the undecoded ContourData values directly with NumPy,
+            by default True
+
+        Returns
+        -------
+        dict
+            Dict of StructureGeometry keyed by ROI number
+        """
+        index = self._get_roi_contour_index()
+        if roi_numbers is None:
+            roi_numbers = index.keys()
+        return {int(number): self.GetStructureGeometry(number, raw)
+                for number in roi_numbers}
+
+    def _get_contour_data(self, contour, raw=True):
+        """Return the ContourData of a contour, parsed from its raw value.
+
+        The raw value is only available if the element has not been
+        converted by pydicom yet, otherwise the converted value is used.
+        """
+        if raw:
+            elem = contour.get_item(0x30060050)
+            if isinstance(elem, RawDataElement) and \
+                    isinstance(elem.value, bytes):
+                try:
+                    return parse_contour_data(elem.value)
+                except ValueError:
+                    logger.debug(
+                        "ContourData could not be parsed from its raw value.")
+        return contour.ContourData
+
+    def _get_roi_contour_index(self):
+        """Index the ROIContourSequence items by their referenced ROI number.
+
+        The sequence is walked once and the index is cached for the
+        ROIContourSequence of the dataset.
+
+        Returns
+        -------
+        dict
+            Lists of ROIContourSequence items keyed by ROI number
+        """
+        sequence = self.ds.get('ROIContourSequence')
+        cached = self._cache.get('roi_contour_index')
+        if cached is not None and cached[0] is sequence:
+            return cached[1]
+
+        index = {}
+        # The coordinate data of each ROI is stored within ROIContourSequence
+        for roi in (sequence or []):
+            index.setdefault(int(roi.ReferencedROINumber), []).append(roi)
+        self._cache['roi_contour_index'] = (sequence, index)
+        return index
 
     def GetContourPoints(self, array):
         """Unflatten a flattened list of xyz point triples.
@@ -689,7 +857,7 @@ class DicomParser:
 
         Parameters
         ----------
-        coords : dict
+        coords : dict or StructureGeometry
             Coordinates of each plane of the structure
         thickness : float
             Thickness of the structure in mm
@@ -699,50 +867,32 @@ class DicomParser:
         float
             Volume of structure in cm3
         """
-        if not shapely_available:
-            print("Shapely library not available." +
-                  " Please install to calculate.")
-            return 0
+        return StructureGeometry.from_dict(coords).volume(thickness)
 
-        class Within:
-            def __init__(self, o):
-                self.o = o
-
-            def __lt__(self, other):
-                return self.o.within(other.o)
-
-        s = 0
-        for i, z in enumerate(sorted(coords.items())):
-            # Skip contour data if it is not CLOSED_PLANAR
-            if z[1][0]['type'] != 'CLOSED_PLANAR':
-                continue
-            polygons = []
-            contours = [[x[0:2] for x in c['data']] for c in z[1]]
-            for contour in contours:
-                p = Polygon(contour)
-                polygons.append(p)
-            # Sort polygons according whether they are contained
-            # by the previous polygon
-            if len(polygons) > 1:
-                ordered_polygons = sorted(polygons, key=Within, reverse=True)
-            else:
-                ordered_polygons = polygons
-            for ip, p in enumerate(ordered_polygons):
-                pa = 0
-                if ((i == 0) or (i == len(coords.items()) - 1)) and \
-                        not (len(coords.items()) == 1):
-                    pa += (p.area // 2)
-                else:
-                    pa += p.area
-                # Subtract the volume if polygon is contained within the parent
-                # and is not the parent itself
-                if p.within(ordered_polygons[0]) and \
-                        (p != ordered_polygons[0]):
-                    s -= pa
-                else:
-                    s += pa
-        vol = s * thickness / 1000
-        return vol
+    def CalculateStructureVolumes(self, roi_numbers=None, thickness=None):
+        """Calculate the volume of multiple structures in a single pass.
+
+        Parameters
+        ----------
+        roi_numbers : iterable, optional
+            ROI numbers used to index structures from RT Struct. If not
+            provided, the volumes of all structures are calculated.
+        thickness : float, optional
+            Thickness of the structures in mm. If not provided, it is
+            determined from the planes of each structure.
+
+        Returns
+        -------
+        dict
+            Volume of each structure in cm3 keyed by ROI number
+        """
+        volumes = {}
+        for number, geometry in \
+                self.GetStructureGeometries(roi_numbers).items():
+            volumes[number] = geometry.volume(
+                thickness if thickness else
+                self.CalculatePlaneThickness(geometry))
+        return volumes
 
 # ============================== RT Dose Methods ==============================
 
@@ -785,46 +935,173 @@ class DicomParser:
         np.array
             An numpy 2d array of dose points
         """
-        # If this is a multi-frame dose pixel array,
-        # determine the offset for each frame
-        if 'GridFrameOffsetVector' in self.ds:
-            pixel_array = self.GetPixelArray()
-            z = float(z)
-            # Get the initial dose grid position (z) in patient coordinates
-            ipp = self.ds.ImagePositionPatient
-            gfov = self.ds.GridFrameOffsetVector
-            # Add the position to the offset vector to determine the
-            # z coordinate of each dose plane
-
-            z_sign = 1 if self.is_head_first_orientation() else -1
-
-            planes = (z_sign * np.array(gfov)) + ipp[2]
-            frame = -1
-            # Check to see if the requested plane exists in the array
-            if (np.amin(np.fabs(planes - z)) < threshold):
-                frame = np.argmin(np.fabs(planes - z))
-            # Return the requested dose plane, since it was found
-            if not (frame == -1):
-                return pixel_array[frame]
-            # Check if the requested plane is within the dose grid boundaries
-            elif ((z < np.amin(planes)) or (z > np.amax(planes))):
-                return np.array([])
-            # The requested plane was not found, so interpolate between planes
-            else:
-                # Determine the upper and lower bounds
-                umin = np.fabs(planes - z)
-                ub = np.argmin(umin)
-                lmin = umin.copy()
-                # Change the min value to the max so we can find the 2nd min
-                lmin[ub] = np.amax(umin)
-                lb = np.argmin(lmin)
-                # Fractional distance of dose plane between upper & lower bound
-                fz = (z - planes[lb]) / (planes[ub] - planes[lb])
-                plane = self.InterpolateDosePlanes(
-                    pixel_array[ub], pixel_array[lb], fz)
-                return plane
-        else:
+        indices = self.GetDoseFrameIndices(z, threshold)
+        if indices is None:
             return np.array([])
+        ub, lb, fz = indices
+        pixel_array = self.GetPixelArray()
+        # Return the requested dose plane, since it was found
+        if ub == lb:
+            return pixel_array[ub]
+        # The requested plane was not found, so interpolate between planes
+        return self.InterpolateDosePlanes(pixel_array[ub], pixel_array[lb], fz)
+
+    def GetDoseFrameIndices(self, z=0, threshold=0.5):
+        """Return the dose frames and weight for the given slice position (mm).
+
+        Parameters
+        ----------
+        z : int, optional
+            Slice position in mm, by default 0
+        threshold : float, optional
+            Threshold in mm to determine the max difference from z
+            to the closest dose slice without using interpolation,
+            by default 0.5
+
+        Returns
+        -------
+        tuple or None
+            Upper and lower bound frame indices and the fractional distance
+            from the lower to the upper bound frame (as used by
+            InterpolateDosePlanes). If the closest frame is within the
+            threshold, both frame indices are identical. None if the
+            position is outside of the dose grid.
+        """
+        if 'GridFrameOffsetVector' not in self.ds:
+            return None
+        planes, positions, frames = self._get_dose_plane_index()
+        z = float(z)
+        # Determine the sorted positions that bracket the requested plane
+        n = len(positions)
+        i = min(max(int(np.searchsorted(positions, z)), 1), n - 1)
+        lower, upper = max(i - 1, 0), i
+        dlower, dupper = abs(positions[lower] - z), abs(positions[upper] - z)
+        # Prefer the lowest frame index if both planes are equally close
+        if dlower < dupper or \
+                (dlower == dupper and frames[lower] < frames[upper]):
+            nearest, other = lower, upper
+        else:
+            nearest, other = upper, lower
+        ub = int(frames[nearest])
+        # Check to see if the requested plane exists in the array
+        if abs(planes[ub] - z) < threshold:
+            return ub, ub, 1.0
+        # Check if the requested plane is within the dose grid boundaries
+        if (z < positions[0]) or (z > positions[-1]):
+            return None
+        lb = int(frames[other])
+        # Fractional distance of dose plane between upper & lower bound
+        fz = (z - planes[lb]) / (planes[ub] - planes[lb])
+        return ub, lb, fz
+
+    def GetDosePlanes(self, z, threshold=0.5):
+        """Return the 2d dose grids for multiple slice positions (mm) at once.
+
+        Parameters
+        ----------
+        z : array_like
+            Slice positions in mm
+        threshold : float, optional
+            Threshold in mm to determine the max difference from z
+            to the closest dose slice without using interpolation,
+            by default 0.5
+
+        Returns
+        -------
+        np.array
+            A numpy 3d (slice, row, column) array of dose points. Slices
+            outside of the dose grid are filled with NaN.
+        """
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        planes = np.full((len(z), self.ds.Rows, self.ds.Columns), np.nan)
+        if 'GridFrameOffsetVector' not in self.ds:
+            return planes
+        ub, lb, fz, found = self._get_dose_frame_indices(z, threshold)
+        pixel_array = self.GetPixelArray()
+        # Return the requested dose planes that were found
+        exact = found & (ub == lb)
+        if exact.any():
+            planes[exact] = pixel_array[ub[exact]]
+        # Interpolate the remaining dose planes within the dose grid
+        interpolated = found & (ub != lb)
+        if interpolated.any():
+            planes[interpolated] = self.InterpolateDosePlanes(
+                pixel_array[ub[interpolated]], pixel_array[lb[interpolated]],
+                fz[interpolated][:, np.newaxis, np.newaxis])
+        return planes
+
+    def _get_dose_frame_indices(self, z, threshold=0.5):
+        """Return the dose frames and weights for multiple slice positions.
+
+        Vectorized equivalent of GetDoseFrameIndices.
+
+        Parameters
+        ----------
+        z : np.array
+            Slice positions in mm
+        threshold : float, optional
+            Threshold in mm to determine the max difference from z
+            to the closest dose slice without using interpolation,
+            by default 0.5
+
+        Returns
+        -------
+        tuple
+            Upper and lower bound frame indices, the fractional distance from
+            the lower to the upper bound frame and whether each position is
+            within the dose grid
+        """
+        planes, positions, frames = self._get_dose_plane_index()
+        # Determine the sorted positions that bracket the requested planes
+        n = len(positions)
+        i = np.clip(np.searchsorted(positions, z), 1, n - 1)
+        lower, upper = np.maximum(i - 1, 0), i
+        dlower = np.abs(positions[lower] - z)
+        dupper = np.abs(positions[upper] - z)
+        # Prefer the lowest frame index if both planes are equally close
+        lower_nearest = (dlower < dupper) | \
+            ((dlower == dupper) & (frames[lower] < frames[upper]))
+        ub = frames[np.where(lower_nearest, lower, upper)]
+        lb = frames[np.where(lower_nearest, upper, lower)]
+        exact = np.abs(planes[ub] - z) < threshold
+        lb[exact] = ub[exact]
+        found = exact | ((z >= positions[0]) & (z <= positions[-1]))
+        fz = np.ones(len(z))
+        interpolated = found & ~exact
+        fz[interpolated] = (z[interpolated] - planes[lb[interpolated]]) / \
+            (planes[ub[interpolated]] - planes[lb[interpolated]])
+        return ub, lb, fz, found
+
+    def _get_dose_plane_index(self):
+        """Return the z position of each dose frame and the sorted index.
+
+        The index is built once per parser and rebuilt if the position or
+        grid frame offset vector of the dose grid are changed.
+
+        Returns
+        -------
+        tuple
+            z position of each frame, sorted z positions and the frame
+            index of each sorted position
+        """
+        ipp = self.ds.ImagePositionPatient
+        gfov = self.ds.GridFrameOffsetVector
+        z_sign = 1 if self.is_head_first_orientation() else -1
+        key = (ipp[2], z_sign)
+        cached = self._cache.get('dose_plane_index')
+        if cached is not None and cached[0] is gfov and cached[1] == key:
+            return cached[2]
+
+        # Add the position to the offset vector to determine the
+        # z coordinate of each dose plane
+        planes = (z_sign * np.array(gfov)) + ipp[2]
+        frames = np.argsort(planes, kind='stable')
+        positions = planes[frames]
+        for array in (planes, positions, frames):
+            array.flags.writeable = False
+        index = (planes, positions, frames)
+        self._cache['dose_plane_index'] = (gfov, key, index)
+        return index
 
     def InterpolateDosePlanes(self, uplane, lplane, fz):
         """Interpolate a dose plane between two bounding planes.
@@ -868,6 +1145,9 @@ class DicomParser:
 
         """
         orientation = self.ds.ImageOrientationPatient
+        key = ('head_first', tuple(orientation))
+        if key in self._cache:
+            return self._cache[key]
         if any(
             all(np.isclose(orientation, hf_orientation))
             for hf_orientation in (  # noqa
@@ -877,6 +1157,7 @@ class DicomParser:
                 [0,  1,  0, -1,  0,  0]   # Head First Decubitus Right
             )
         ):
+            self._cache[key] = True
             return True
         elif any(
             all(np.isclose(orientation, ff_orientation))
@@ -887,6 +1168,7 @@ class DicomParser:
                 [-1,  0,  0,  0,  1,  0]   # Feet First Supine
             )
         ):
+            self._cache[key] = False
             return False
         else:
             raise NotImplementedError(
@@ -909,6 +1191,9 @@ class DicomParser:
             1 if real-world X along rows
         """
         orientation = self.ds.ImageOrientationPatient
+        key = ('x_lut_index', tuple(orientation))
+        if key in self._cache:
+            return self._cache[key]
         if any(
             all(np.isclose(orientation, non_decub))
             for non_decub in (
@@ -918,6 +1203,7 @@ class DicomParser:
                 [1,  0,  0,  0, -1,  0]   # Feet First Prone
             )
         ):
+            self._cache[key] = 0
             return 0
         elif any(
             all(np.isclose(orientation, decub))
@@ -928,6 +1214,7 @@ class DicomParser:
                 [0, -1,  0, -1,  0,  0]   # Feet First Decubitus Right
             )
         ):
+            self._cache[key] = 1
             return 1
         else:
             raise NotImplementedError(
@@ -959,21 +1246,18 @@ class DicomParser:
         return list(zip(isodose[1].tolist(), isodose[0].tolist()))
 
     def GetDoseData(self):
-        """Return the dose data from a DICOM RT Dose file."""
+        """Return the dose data from a DICOM RT Dose file.
+
+        The dose maximum, LUT and orientation are memoized, so subsequent
+        calls do not scan the dose grid again unless the pixel data changes.
+        """
         data = self.GetImageData()
         data['doseunits'] = getattr(self.ds, 'DoseUnits', '')
         data['dosetype'] = getattr(self.ds, 'DoseType', '')
         data['dosecomment'] = getattr(self.ds, 'DoseComment', '')
         data['dosesummationtype'] = getattr(self.ds, 'DoseSummationType', '')
         data['dosegridscaling'] = getattr(self.ds, 'DoseGridScaling', '')
-        dosemax = 0
-        for x in range(data["frames"]):
-            pixel_array = self.GetPixelArray()
-            newmax = pixel_array[x].max()
-            dosemax = newmax if newmax > dosemax else dosemax
-            if self.memmap_pixel_array:
-                del pixel_array
-        data['dosemax'] = float(dosemax)
+        data['dosemax'] = self.GetDoseMax() if data['frames'] else 0.0
         data['lut'] = self.GetPatientToPixelLUT()
         data['x_lut_index'] = self.x_lut_index()
         data['fraction'] = ''
@@ -986,6 +1270,41 @@ class DicomParser:
 
         return data
 
+    def GetDoseMax(self, chunk_size=64 * 2**20):
+        """Return the maximum stored pixel value of the dose grid.
+
+        The value is memoized until the pixel data changes.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Maximum number of bytes of a memory mapped pixel array that are
+            read at once, by default 64 MB
+
+        Returns
+        -------
+        float
+            Maximum pixel value (not scaled by DoseGridScaling)
+        """
+        # Memory mapped pixel data is read from the unchanging file on disk
+        pixel_data = self.filename if self.memmap_pixel_array \
+            else self.GetPixelArray()
+        cached = self._cache.get('dosemax')
+        if cached is not None and cached[0] is pixel_data:
+            return cached[1]
+
+        pixel_array = self.GetPixelArray()
+        if self.memmap_pixel_array and pixel_array.ndim > 2:
+            # Read the memory mapped frames in large chunks
+            step = max(1, chunk_size // max(pixel_array[0].nbytes, 1))
+            dosemax = max(pixel_array[i:i + step].max()
+                          for i in range(0, pixel_array.shape[0], step))
+        else:
+            dosemax = pixel_array.max()
+        dosemax = float(max(dosemax, 0))
+        self._cache['dosemax'] = (pixel_data, dosemax)
+        return dosemax
+
     def GetReferencedBeamNumber(self):
         """Return the referenced beam number (if it exists) from RT Dose."""
         beam = None
@@ -1081,3 +1400,77 @@ class DicomParser:
                         beams[b.ReferencedBeamNumber]['dose'] = \
                             b.BeamDose * nfx * 100
         return beams
+
+
+def apply_window_level(data, window, level):
+    """Apply the RGB Look-Up Table for the data and window/level value.
+
+    Parameters
+    ----------
+    data : numpy array
+        Rescaled pixel data array
+    window : float
+        Image window value
+    level : float
+        Image window level or width
+
+    Returns
+    -------
+    numpy array
+        Modified numpy array with RGB LUT applied
+    """
+    lutvalue = util.piecewise(
+        data,
+        [data <= (level - 0.5 - (window - 1) / 2),
+         data > (level - 0.5 + (window - 1) / 2)],
+        [0, 255, lambda data:
+         ((data - (level - 0.5)) / (window-1) + 0.5) *
+         (255 - 0)])
+    # Convert the resultant array to an unsigned 8-bit array to create
+    # an 8-bit grayscale LUT since the range is only from 0 to 255
+    return np.array(lutvalue, dtype=np.uint8)
+
+
+def get_window_level_lut(window, level, slope, intercept, dtype):
+    """Return an 8-bit LUT for all stored values of an integer pixel dtype.
+
+    The LUT is indexed by the stored pixel values viewed as unsigned
+    integers of the same size, i.e. ``lut[pixel_array.view('u2')]``, and
+    includes the rescale slope and intercept.
+
+    Parameters
+    ----------
+    window : float
+        Image window value
+    level : float
+        Image window level or width
+    slope : float
+        Rescale slope of the stored pixel values
+    intercept : float
+        Rescale intercept of the stored pixel values
+    dtype : numpy dtype
+        Data type of the stored pixel values
+
+    Returns
+    -------
+    numpy array or None
+        Read-only uint8 LUT or None if the dtype is not a native 8 or 16 bit
+        integer type
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind not in 'iu' or dtype.itemsize > 2 or not dtype.isnative:
+        return None
+    # The rescaled data type affects the result of the window/level math
+    rescaled_dtype = (np.zeros(1, dtype=dtype) * slope + intercept).dtype
+    return _window_level_lut(
+        window, level, slope, intercept, dtype.str, rescaled_dtype.str)
+
+
+@lru_cache(maxsize=32)
+def _window_level_lut(window, level, slope, intercept, dtype, rescaled_dtype):
+    """Calculate the window/level LUT for all stored values of a dtype."""
+    itemsize = np.dtype(dtype).itemsize
+    values = np.arange(2 ** (8 * itemsize), dtype='u%d' % itemsize).view(dtype)
+    lut = apply_window_level(values * slope + intercept, window, level)
+    lut.flags.writeable = False
+    return lut
@@ -7,9 +7,12 @@
 #    See the file license.txt included with this distribution, also
 #    available at https://github.com/dicompyler/dicompyler-core/
 
+import json
 import numpy as np
 import re
 import logging
+import struct
+from functools import lru_cache
 logger = logging.getLogger('dicompylercore.dvh')
 
 # Set default absolute dose and volume  units
@@ -17,9 +20,31 @@ abs_dose_units = 'Gy'
 abs_volume_units = 'cm3'
 relative_units = '%'
 
+# Interpolate dose & volume constraints between dose bins by default.
+# Set to False to use the nearest dose bin as in previous versions.
+interpolate_constraints = True
+
+# Regex used to determine dose & volume statistics, i.e. D90 or V20Gy
+statistic_pattern = re.compile(
+    r'(\S+)?(D|V){1}(\d+[.]?\d*)(gy|cc)?(?!\S+)', re.IGNORECASE)
+
+# Magic number of the binary DVH format used by DVH.to_bytes & save_dvhs
+dvh_format_magic = b'DVH\x01'
+
 
 class DVH(object):
-    """Class that stores dose volume histogram (DVH) data."""
+    """Class that stores dose volume histogram (DVH) data.
+
+    DVH instances are treated as immutable: derived DVHs (i.e. differential,
+    cumulative or relative volume) and statistics are memoized after they
+    are first calculated. Assigning a new value to any of the public
+    attributes clears the memoized values, but modifying the counts or bins
+    arrays in place does not.
+    """
+
+    # Attributes used to initialize a DVH, copied to each derived DVH
+    attributes = ('counts', 'bins', 'dvh_type', 'dose_units', 'volume_units',
+                  'rx_dose', 'name', 'color', 'notes')
 
     def __init__(self, counts, bins,
                  dvh_type='cumulative',
@@ -106,6 +131,63 @@ class DVH(object):
 
         return cls(counts, bins)
 
+    def to_bytes(self):
+        """Serialize the DVH in the compact binary DVH format.
+
+        The counts are stored as float32 and uniform dose bins as their
+        start and width. See save_dvhs to store multiple DVHs in one file.
+
+        Returns
+        -------
+        bytes
+            Binary representation of the DVH
+        """
+        return b''.join(_pack_dvhs([self]))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Initialization for a DVH from the binary DVH format.
+
+        Parameters
+        ----------
+        data : bytes
+            Binary representation of a DVH from DVH.to_bytes
+
+        Raises
+        ------
+        ValueError
+            Raised if the data is not a single DVH in the binary DVH format
+        """
+        dvhs = DVHStore(np.frombuffer(data, dtype=np.uint8))
+        if len(dvhs) != 1:
+            raise ValueError("Data does not contain a single DVH.")
+        return dvhs[0]
+
+    def __setattr__(self, name, value):
+        """Clear the memoized values when an attribute is assigned."""
+        self.__dict__.pop('_cache', None)
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        """Return the state of the DVH for pickling without memoized values."""
+        return {k: v for k, v in self.__dict__.items() if k != '_cache'}
+
+    def __setstate__(self, state):
+        """Restore the state of the DVH when unpickling."""
+        self.__dict__.update(state)
+
+    def _memoize(self, key, func):
+        """Return the memoized value of key, calling func to calculate it."""
+        cache = self.__dict__.setdefault('_cache', {})
+        if key not in cache:
+            cache[key] = func()
+        return cache[key]
+
+    def _derive(self, **kwargs):
+        """Return a new DVH with the attributes of this DVH and kwargs."""
+        return DVH(**dict(
+            {k: getattr(self, k) for k in self.attributes}, **kwargs))
+
     def __repr__(self):
         """String representation of the class."""
         return 'DVH(%s, %r bins: [%r:%r] %s, volume: %r %s, name: %r, ' \
@@ -152,8 +234,7 @@ class DVH(object):
         if self.dvh_type == dvh_type:
             return self
         else:
-            return DVH(**dict(
-                self.__dict__,
+            return self._memoize(dvh_type, lambda: self._derive(
                 counts=abs(np.diff(np.append(self.counts, 0))),
                 dvh_type=dvh_type))
 
@@ -164,8 +245,7 @@ class DVH(object):
         if self.dvh_type == dvh_type:
             return self
         else:
-            return DVH(**dict(
-                self.__dict__,
+            return self._memoize(dvh_type, lambda: self._derive(
                 counts=self.counts[::-1].cumsum()[::-1],
                 dvh_type=dvh_type))
 
@@ -192,10 +272,10 @@ class DVH(object):
                 raise AttributeError("'DVH' has no defined prescription dose.")
             else:
                 rxdose = rx_dose if self.rx_dose is None else self.rx_dose
-            return DVH(**dict(
-                self.__dict__,
-                bins=self.bins * rxdose / 100,
-                dose_units=dose_units))
+            return self._memoize(
+                ('absolute_dose', rxdose, dose_units), lambda: self._derive(
+                    bins=self.bins * rxdose / 100,
+                    dose_units=dose_units))
 
     def relative_dose(self, rx_dose=None):
         """Return a relative dose DVH based on a prescription dose.
@@ -220,10 +300,10 @@ class DVH(object):
                 raise AttributeError("'DVH' has no defined prescription dose.")
             else:
                 rxdose = rx_dose if self.rx_dose is None else self.rx_dose
-            return DVH(**dict(
-                self.__dict__,
-                bins=100 * self.bins / rxdose,
-                dose_units=dose_units))
+            return self._memoize(
+                ('relative_dose', rxdose), lambda: self._derive(
+                    bins=100 * self.bins / rxdose,
+                    dose_units=dose_units))
 
     def absolute_volume(self, volume, volume_units=abs_volume_units):
         """Return an absolute volume DVH.
@@ -238,10 +318,11 @@ class DVH(object):
         if not (self.volume_units == relative_units):
             return self
         else:
-            return DVH(**dict(
-                self.__dict__,
-                counts=volume * self.counts / 100,
-                volume_units=volume_units))
+            return self._memoize(
+                ('absolute_volume', volume, volume_units),
+                lambda: self._derive(
+                    counts=volume * self.counts / 100,
+                    volume_units=volume_units))
 
     @property
     def relative_volume(self):
@@ -251,17 +332,22 @@ class DVH(object):
             return self
         # Convert back to cumulative before returning a relative volume
         elif self.dvh_type == 'differential':
-            return self.cumulative.relative_volume.differential
+            return self._memoize(
+                volume_units,
+                lambda: self.cumulative.relative_volume.differential)
         else:
-            return DVH(**dict(
-                self.__dict__,
+            return self._memoize(volume_units, lambda: self._derive(
                 counts=100 * self.counts /
-                       (1 if (self.max == 0) else self.counts.max()),
-                       volume_units=volume_units))
+                (1 if (self.max == 0) else self.counts.max()),
+                volume_units=volume_units))
 
     @property
     def max(self):
         """Return the maximum dose."""
+        return self._memoize('max', self._max)
+
+    def _max(self):
+        """Calculate the maximum dose."""
         if self.counts.size <= 1 or max(self.counts) == 0:
             return 0
         diff = self.differential
@@ -271,6 +357,10 @@ class DVH(object):
     @property
     def min(self):
         """Return the minimum dose."""
+        return self._memoize('min', self._min)
+
+    def _min(self):
+        """Calculate the minimum dose."""
         if self.counts.size <= 1 or max(self.counts) == 0:
             return 0
         diff = self.differential
@@ -280,6 +370,10 @@ class DVH(object):
     @property
     def mean(self):
         """Return the mean dose."""
+        return self._memoize('mean', self._mean)
+
+    def _mean(self):
+        """Calculate the mean dose."""
         if self.counts.size <= 1 or max(self.counts) == 0:
             return 0
         diff = self.differential
@@ -289,7 +383,8 @@ class DVH(object):
     @property
     def volume(self):
         """Return the volume of the structure."""
-        return self.differential.counts.sum()
+        return self._memoize(
+            'volume', lambda: self.differential.counts.sum())
 
     def describe(self):
         """Describe a summary of DVH statistics in a text based format."""
@@ -412,7 +507,7 @@ class DVH(object):
                 plt.legend(loc='best')
         return self
 
-    def volume_constraint(self, dose, dose_units=None):
+    def volume_constraint(self, dose, dose_units=None, interpolate=None):
         """Calculate the volume that receives at least a specific dose.
 
         i.e. V100, V150 or V20Gy
@@ -422,25 +517,39 @@ class DVH(object):
         dose : number
             Dose value used to determine minimum volume that receives
             this dose. Can either be in relative or absolute dose units.
+        interpolate : bool, optional
+            Linearly interpolate the volume between dose bins instead of
+            using the volume of the nearest dose bin. By default, the
+            module level `interpolate_constraints` setting is used.
 
         Returns
         -------
         number
             Volume in self.volume_units units.
         """
+        return self._volume_constraints([dose], dose_units, interpolate)[0]
+
+    def _volume_constraints(self, doses, dose_units=None, interpolate=None):
+        """Calculate the volumes that receive at least the given doses."""
         # Determine whether to lookup relative dose or absolute dose
         if not dose_units:
             dose_bins = self.relative_dose().bins
         else:
             dose_bins = self.absolute_dose().bins
-        index = np.argmin(np.fabs(dose_bins - dose))
-        # TODO Add interpolation
-        if index >= self.counts.size:
-            return DVHValue(0.0, self.volume_units)
-        else:
-            return DVHValue(self.counts[index], self.volume_units)
-
-    def dose_constraint(self, volume, volume_units=None):
+        if _interpolate(interpolate):
+            # The volume receiving at least the dose of the last bin edge is 0
+            size = min(dose_bins.size, self.counts.size + 1)
+            volumes = np.interp(
+                doses, dose_bins[:size],
+                np.append(self.counts, 0)[:size], right=0.0)
+            return [DVHValue(volume, self.volume_units)
+                    for volume in volumes.tolist()]
+        indices = _nearest_indices(dose_bins, doses)
+        return [DVHValue(0.0, self.volume_units) if index >= self.counts.size
+                else DVHValue(self.counts[index], self.volume_units)
+                for index in indices.tolist()]
+
+    def dose_constraint(self, volume, volume_units=None, interpolate=None):
         """Calculate the maximum dose that a specific volume receives.
 
         i.e. D90, D100 or D2cc
@@ -450,76 +559,128 @@ class DVH(object):
         volume : number
             Volume used to determine the maximum dose that the volume receives.
             Can either be in relative or absolute volume units.
+        interpolate : bool, optional
+            Linearly interpolate the dose between dose bins instead of
+            using the dose bin with the nearest volume. By default, the
+            module level `interpolate_constraints` setting is used.
 
         Returns
         -------
         number
             Dose in self.dose_units units.
         """
+        return self._dose_constraints([volume], volume_units, interpolate)[0]
+
+    def _dose_constraints(self, volumes, volume_units=None, interpolate=None):
+        """Calculate the maximum doses that the given volumes receive."""
         # Determine whether to lookup relative volume or absolute volume
         if not volume_units:
             volume_counts = self.relative_volume.counts
         else:
             volume_counts = self.absolute_volume(self.volume).counts
 
-        if volume_counts.size == 0 or volume > volume_counts.max():
-            return DVHValue(0.0, self.dose_units)
-
-        # D100 case
-        if volume == 100 and not volume_units:
-            # Flipping the difference volume array
-            reversed_difference_of_volume = np.flip(
-                np.fabs(volume_counts - volume), 0)
-
-            # Index of the first minimum value in reversed array
-            index_min_value = np.argmin(reversed_difference_of_volume)
-            index_range = len(reversed_difference_of_volume) - 1
-
-            return DVHValue(
-                self.bins[index_range - index_min_value], self.dose_units)
-
-        # TODO Add interpolation
-        return DVHValue(
-            self.bins[np.argmin(
-                np.fabs(volume_counts - volume))],
-            self.dose_units)
-
-    def statistic(self, name):
+        volumes = np.asarray(volumes, dtype=float)
+        if volume_counts.size == 0:
+            return [DVHValue(0.0, self.dose_units) for v in volumes]
+
+        if _interpolate(interpolate):
+            # The volume receiving at least the dose of the last bin edge is 0
+            size = min(self.bins.size, volume_counts.size + 1)
+            bins = self.bins[:size]
+            counts = np.append(volume_counts, 0)[:size]
+            # Last bin that receives at least the volume & the next bin
+            lower = _last_indices_above(counts, volumes)
+            upper = np.minimum(lower + 1, size - 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fraction = (counts[lower] - volumes) / \
+                    (counts[lower] - counts[upper])
+            doses = np.where(
+                upper > lower,
+                bins[lower] + fraction * (bins[upper] - bins[lower]),
+                bins[lower])
+        else:
+            indices = _nearest_indices(volume_counts, volumes)
+            # D100 case: use the last dose bin that has the volume
+            if not volume_units and np.any(volumes == 100):
+                indices[volumes == 100] = _nearest_indices(
+                    volume_counts, [100], last=True)[0]
+            doses = self.bins[indices]
+
+        outside = (volumes > volume_counts.max()).tolist()
+        return [DVHValue(0.0, self.dose_units) if out
+                else DVHValue(dose, self.dose_units)
+                for dose, out in zip(doses.tolist(), outside)]
+
+    def statistic(self, name, interpolate=None):
         """Return a DVH dose or volume statistic.
 
         Parameters
         ----------
         name : str
             DVH statistic in the form of D90, D100, D2cc, V100 or V20Gy, etc.
+        interpolate : bool, optional
+            Linearly interpolate between dose bins. By default, the
+            module level `interpolate_constraints` setting is used.
 
         Returns
         -------
         number
             Value from the dose or volume statistic calculation.
         """
-        # Compile a regex to determine dose & volume statistics
-        p = re.compile(r'(\S+)?(D|V){1}(\d+[.]?\d*)(gy|cc)?(?!\S+)',
-                       re.IGNORECASE)
-        match = re.match(p, name)
-        # Return the default attribute if not a dose or volume statistic
-        # print(match.groups())
-        if not match or match.groups()[0] is not None:
-            raise AttributeError("'DVH' has no attribute '%s'" % name)
-
-        # Process the regex match
-        c = [x.lower() for x in match.groups() if x]
-        if c[0] == ('v'):
+        interpolate = _interpolate(interpolate)
+        return self._memoize(('statistic', name, interpolate),
+                             lambda: self._statistic(name, interpolate))
+
+    def _statistic(self, name, interpolate):
+        """Calculate a DVH dose or volume statistic."""
+        constraint, value, units = _parse_statistic(name)
+        if constraint == 'v':
             # Volume Constraints (i.e. V100) & return a volume
-            if len(c) == 2:
-                return self.cumulative.volume_constraint(float(c[1]))
-            # Volume Constraints in abs dose (i.e. V20Gy) & return a volume
-            return self.cumulative.volume_constraint(float(c[1]), c[2])
-        elif c[0] == ('d'):
-            # Dose Constraints (i.e. D90) & return a dose
-            if len(c) == 2:
-                return self.cumulative.dose_constraint(float(c[1]))
-            # Dose Constraints in abs volume (i.e. D2cc) & return a dose
-            return self.cumulative.dose_constraint(float(c[1]), c[2])
+            # or in abs dose (i.e. V20Gy)
+            return self.cumulative.volume_constraint(
+                value, units, interpolate)
+        # Dose Constraints (i.e. D90) & return a dose
+        # or in abs volume (i.e. D2cc)
+        return self.cumulative.dose_constraint(value, units, interpolate)
+
+    def statistics(self, names, interpolate=None):
+        """Return multiple DVH dose or volume statistics at once.
+
+        The statistics are grouped by type and units and each group is
+        calculated with a single lookup in the cumulative DVH.
+
+        Parameters
+        ----------
+        names : iterable
+            DVH statistics in the form of D90, D100, D2cc, V100 or V20Gy, etc.
+        interpolate : bool, optional
+            Linearly interpolate between dose bins. By default, the
+            module level `interpolate_constraints` setting is used.
+
+        Returns
+        -------
+        dict
+            DVHValue of each statistic keyed by name.
+        """
+        interpolate = _interpolate(interpolate)
+        cache = self.__dict__.setdefault('_cache', {})
+        groups = {}
+        for name in names:
+            if ('statistic', name, interpolate) not in cache:
+                constraint, value, units = _parse_statistic(name)
+                groups.setdefault((constraint, units), {})[name] = value
+        cumulative = self.cumulative
+        for (constraint, units), group in groups.items():
+            if constraint == 'v':
+                values = cumulative._volume_constraints(
+                    list(group.values()), units, interpolate)
+            else:
+                values = cumulative._dose_constraints(
+                    list(group.values()), units, interpolate)
+            for name, value in zip(group, values):
+                cache[('statistic', name, interpolate)] = value
+        return {name: cache[('statistic', name, interpolate)]
+                for name in names}
 
     def __getattr__(self, name):
         """Method used to dynamically determine dose or volume stats.
@@ -537,6 +698,103 @@ class DVH(object):
         return self.statistic(name)
 
 
+def _interpolate(interpolate):
+    """Return whether to interpolate, using the module setting if None."""
+    return interpolate_constraints if interpolate is None else \
+        bool(interpolate)
+
+
+@lru_cache(maxsize=1024)
+def _parse_statistic(name):
+    """Parse a DVH statistic name, i.e. D90, D2cc, V100 or V20Gy.
+
+    Returns
+    -------
+    tuple
+        Type of the statistic ('d' or 'v'), its value and units (or None)
+    """
+    match = statistic_pattern.match(name)
+    # Return the default attribute if not a dose or volume statistic
+    if not match or match.groups()[0] is not None:
+        raise AttributeError("'DVH' has no attribute '%s'" % name)
+
+    # Process the regex match
+    c = [x.lower() for x in match.groups() if x]
+    return c[0], float(c[1]), c[2] if len(c) == 3 else None
+
+
+def _nearest_indices(values, targets, last=False):
+    """Find the indices of the values nearest to each target.
+
+    Equivalent to numpy.argmin(numpy.fabs(values - target)) for each target,
+    using a binary search if the values are monotonic.
+
+    Parameters
+    ----------
+    values : numpy array
+        Values to search, i.e. DVH bins or counts
+    targets : iterable
+        Values to find the nearest value of
+    last : bool, optional
+        Return the last instead of the first index of the nearest value
+
+    Returns
+    -------
+    numpy array
+        Index of the nearest value for each target
+    """
+    values = np.asarray(values)
+    targets = np.asarray(targets, dtype=float)
+    n = values.size
+    diff = np.diff(values)
+    if np.all(diff >= 0):
+        # Ties between the values on either side go to the first index
+        i = np.searchsorted(values, targets)
+        lower, upper = np.clip(i - 1, 0, n - 1), np.clip(i, 0, n - 1)
+        lower_diff = np.fabs(values[lower] - targets)
+        upper_diff = np.fabs(values[upper] - targets)
+        use_upper = (upper_diff < lower_diff) | \
+            ((upper_diff == lower_diff) & last)
+        nearest = np.where(use_upper, values[upper], values[lower])
+        if last:
+            return np.searchsorted(values, nearest, side='right') - 1
+        return np.searchsorted(values, nearest, side='left')
+    elif np.all(diff <= 0):
+        # Search the reversed values, where the first index becomes the last
+        return n - 1 - _nearest_indices(values[::-1], targets, not last)
+    diff = np.fabs(values[np.newaxis, :] - targets[:, np.newaxis])
+    if last:
+        return n - 1 - np.argmin(diff[:, ::-1], axis=1)
+    return np.argmin(diff, axis=1)
+
+
+def _last_indices_above(values, targets):
+    """Find the last index of the values that is at least each target.
+
+    Parameters
+    ----------
+    values : numpy array
+        Values to search, i.e. cumulative DVH counts
+    targets : numpy array
+        Values to compare against. If no value is at least the target,
+        the first index is returned.
+
+    Returns
+    -------
+    numpy array
+        Last index of the values that are greater or equal to each target
+    """
+    n = values.size
+    if np.all(np.diff(values) <= 0):
+        # The values that are at least the target precede all others
+        count = n - np.searchsorted(values[::-1], targets, side='left')
+    else:
+        above = values[np.newaxis, :] >= targets[:, np.newaxis]
+        count = np.where(
+            above.any(axis=1), n - np.argmax(above[:, ::-1], axis=1), 0)
+    return np.maximum(count - 1, 0)
+
+
 class DVHValue(object):
     """Class that stores DVH values with the appropriate units."""
 
@@ -575,3 +833,481 @@ class DVHValue(object):
         attribs_eq = self.units == other.units
         return attribs_eq and \
             np.allclose(self.value, other.value)
+
+
+class DVHCollection(object):
+    """Class that stores a population of DVHs on a shared dose bin grid.
+
+    The cumulative counts of the DVHs are resampled onto the same dose bins
+    and stored in a single (DVHs, bins) float32 array, so that population
+    curves and statistics are calculated for all DVHs at once.
+    """
+
+    def __init__(self, dvhs, bins=None, patients=None):
+        """Initialization for a DVHCollection from existing DVHs.
+
+        Parameters
+        ----------
+        dvhs : iterable
+            DVH instances with equivalent dose & volume units
+        bins : iterable or numpy array, optional
+            Dose bins shared by the DVHs. If not provided, the bins of the
+            DVHs are used if they are equal, otherwise uniform bins with the
+            smallest bin width of the DVHs are used.
+        patients : iterable, optional
+            Patient (i.e. Patient ID) of each DVH
+
+        Raises
+        ------
+        AttributeError
+            If the DVHs do not have equivalent dose & volume units
+        """
+        dvhs = [dvh.cumulative for dvh in dvhs]
+        units = set((dvh.dose_units, dvh.volume_units) for dvh in dvhs)
+        if len(units) > 1:
+            raise AttributeError("DVH units are not equivalent")
+        self.dose_units, self.volume_units = units.pop() if units else \
+            (abs_dose_units, abs_volume_units)
+        self.bins = np.asarray(bins, dtype=float) if bins is not None else \
+            _shared_bins([dvh.bins for dvh in dvhs])
+        self._counts = np.zeros(
+            (len(dvhs), max(self.bins.size - 1, 0)), dtype=np.float32)
+        for row, dvh in zip(self._counts, dvhs):
+            if self.bins.size == dvh.bins.size and \
+                    np.array_equal(self.bins, dvh.bins):
+                row[:] = dvh.counts
+            else:
+                # Resample the cumulative volume at the lower bin edges
+                size = min(dvh.bins.size, dvh.counts.size + 1)
+                row[:] = np.interp(
+                    self.bins[:-1], dvh.bins[:size],
+                    np.append(dvh.counts, 0)[:size], right=0.0)
+        self._names = np.array([dvh.name for dvh in dvhs], dtype=object)
+        self._patients = np.array(
+            list(patients) if patients is not None else [None] * len(dvhs),
+            dtype=object)
+        self._rx_doses = np.array(
+            [dvh.rx_dose if dvh.rx_dose else np.nan for dvh in dvhs],
+            dtype=float)
+        self._indices = None
+
+    def __repr__(self):
+        """String representation of the class."""
+        return 'DVHCollection(%r DVHs, %r bins: [%r:%r] %s, %s)' % (
+            len(self), self.bins.size - 1, self.bins.min(), self.bins.max(),
+            self.dose_units, self.volume_units)
+
+    def __len__(self):
+        """Return the number of DVHs in the collection."""
+        return len(self._names) if self._indices is None else \
+            len(self._indices)
+
+    def __getitem__(self, index):
+        """Return the DVH at the index as a cumulative DVH."""
+        if self._indices is not None:
+            index = self._indices[index]
+        rx_dose = self._rx_doses[index]
+        return DVH(self._counts[index].astype(np.float64), self.bins,
+                   dose_units=self.dose_units, volume_units=self.volume_units,
+                   rx_dose=None if np.isnan(rx_dose) else rx_dose,
+                   name=self._names[index])
+
+    def __iter__(self):
+        """Iterate over the DVHs in the collection."""
+        return (self[i] for i in range(len(self)))
+
+    def _select(self, array):
+        """Return the rows of the array of the DVHs in the collection."""
+        return array if self._indices is None else array[self._indices]
+
+    @property
+    def counts(self):
+        """Return the (DVHs, bins) array of cumulative counts."""
+        return self._select(self._counts)
+
+    @property
+    def names(self):
+        """Return the structure name of each DVH."""
+        return self._select(self._names)
+
+    @property
+    def patients(self):
+        """Return the patient of each DVH."""
+        return self._select(self._patients)
+
+    @property
+    def rx_doses(self):
+        """Return the prescription dose of each DVH (NaN if undefined)."""
+        return self._select(self._rx_doses)
+
+    def filter(self, name=None, patient=None):
+        """Return the DVHs that match the structure name and / or patient.
+
+        The returned collection shares the counts array of this collection.
+
+        Parameters
+        ----------
+        name : str or iterable, optional
+            Structure name(s) of the DVHs to include
+        patient : str or iterable, optional
+            Patient(s) of the DVHs to include
+
+        Returns
+        -------
+        DVHCollection
+            Collection of the matching DVHs
+        """
+        indices = np.arange(len(self._names)) if self._indices is None \
+            else self._indices
+        mask = np.ones(indices.size, dtype=np.bool_)
+        for values, match in ((self._names, name),
+                              (self._patients, patient)):
+            if match is None:
+                continue
+            if isinstance(match, str):
+                match = [match]
+            mask &= np.isin(values[indices], list(match))
+        collection = object.__new__(DVHCollection)
+        collection.__dict__.update(self.__dict__)
+        collection._indices = indices[mask]
+        return collection
+
+# ========================== Population statistics ========================= #
+
+    def _population_dvh(self, counts, name):
+        """Return a cumulative DVH of population counts."""
+        return DVH(counts, self.bins, dose_units=self.dose_units,
+                   volume_units=self.volume_units, name=name)
+
+    def mean(self):
+        """Return the mean DVH of the collection."""
+        return self._population_dvh(
+            self.counts.mean(axis=0, dtype=np.float64), 'mean')
+
+    def median(self):
+        """Return the median DVH of the collection."""
+        return self._population_dvh(np.median(self.counts, axis=0), 'median')
+
+    def percentile(self, q):
+        """Return the percentile DVH(s) of the collection.
+
+        Parameters
+        ----------
+        q : number or iterable
+            Percentile(s) between 0 and 100, i.e. (5, 95) for a band
+
+        Returns
+        -------
+        DVH or list
+            DVH of the percentile, or a list of DVHs for multiple percentiles
+        """
+        curves = np.percentile(self.counts, q, axis=0)
+        if np.ndim(q) == 0:
+            return self._population_dvh(curves, 'P%g' % q)
+        return [self._population_dvh(c, 'P%g' % p) for c, p in zip(curves, q)]
+
+    def statistics(self, names, interpolate=None):
+        """Return DVH dose or volume statistics of every DVH at once.
+
+        Parameters
+        ----------
+        names : iterable
+            DVH statistics in the form of D90, D100, D2cc, V100 or V20Gy, etc.
+        interpolate : bool, optional
+            Linearly interpolate between dose bins. By default, the
+            module level `interpolate_constraints` setting is used.
+
+        Returns
+        -------
+        dict
+            Array of the statistic value of each DVH keyed by name. Doses
+            are in self.dose_units units and volumes in self.volume_units.
+        """
+        interpolate = _interpolate(interpolate)
+        counts = self.counts.astype(np.float64)
+        rx_doses = self.rx_doses
+        stats = {}
+        for name in names:
+            constraint, value, units = _parse_statistic(name)
+            if constraint == 'v':
+                relative = self.dose_units == relative_units
+                if bool(units) == relative:
+                    # Convert between relative and absolute dose
+                    if np.any(np.isnan(rx_doses)):
+                        raise AttributeError(
+                            "'DVH' has no defined prescription dose.")
+                    value = value * 100 / rx_doses if relative else \
+                        value * rx_doses / 100
+                stats[name] = _grid_volume_constraints(
+                    counts, self.bins, np.broadcast_to(value, len(counts)),
+                    interpolate)
+            else:
+                volumes = counts
+                if not units and self.volume_units != relative_units:
+                    maxima = counts.max(axis=1, initial=0)
+                    volumes = 100 * counts / np.where(
+                        maxima == 0, 1, maxima)[:, np.newaxis]
+                stats[name] = _grid_dose_constraints(
+                    volumes, self.bins, value, interpolate,
+                    last=(value == 100 and not units))
+        return stats
+
+
+def _shared_bins(bins):
+    """Return the shared dose bins for a list of DVH bins.
+
+    The bins are returned if they are all equal, otherwise uniform bins
+    with the smallest bin width, covering the largest dose, are returned.
+    """
+    if not bins:
+        return np.array([0.0])
+    if all((b.size == bins[0].size) and np.array_equal(b, bins[0])
+           for b in bins[1:]):
+        return np.asarray(bins[0], dtype=float)
+    widths = np.concatenate([np.diff(b) for b in bins])
+    width = widths[widths > 0].min()
+    maximum = max(b[-1] for b in bins)
+    return np.arange(int(np.ceil(round(maximum / width, 6))) + 1) * width
+
+
+def _grid_volume_constraints(counts, bins, doses, interpolate):
+    """Calculate the volume that receives at least the dose of each row."""
+    n, m = counts.shape
+    rows = np.arange(n)
+    if not interpolate:
+        indices = _nearest_indices(bins, doses)
+        volumes = counts[rows, np.minimum(indices, max(m - 1, 0))] if m \
+            else np.zeros(n)
+        return np.where(indices >= m, 0.0, volumes)
+    # The volume receiving at least the dose of the last bin edge is 0
+    size = min(bins.size, m + 1)
+    curve = np.hstack((counts, np.zeros((n, 1))))[:, :size]
+    x = bins[:size]
+    upper = np.searchsorted(x, doses, side='right')
+    lower = np.clip(upper - 1, 0, size - 1)
+    upper = np.clip(upper, 0, size - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(
+            upper > lower, (doses - x[lower]) / (x[upper] - x[lower]), 0)
+    volumes = curve[rows, lower] + \
+        fraction * (curve[rows, upper] - curve[rows, lower])
+    volumes[doses < x[0]] = curve[doses < x[0], 0]
+    volumes[doses > x[-1]] = 0.0
+    return volumes
+
+
+def _grid_dose_constraints(counts, bins, volume, interpolate, last=False):
+    """Calculate the maximum dose that the volume receives for each row."""
+    n, m = counts.shape
+    if not m:
+        return np.zeros(n)
+    rows = np.arange(n)
+    if not interpolate:
+        diff = np.fabs(counts - volume)
+        indices = m - 1 - np.argmin(diff[:, ::-1], axis=1) if last else \
+            np.argmin(diff, axis=1)
+        doses = bins[indices]
+    else:
+        # The volume receiving at least the dose of the last bin edge is 0
+        size = min(bins.size, m + 1)
+        curve = np.hstack((counts, np.zeros((n, 1))))[:, :size]
+        x = bins[:size]
+        # Last bin that receives at least the volume & the next bin
+        above = curve >= volume
+        lower = np.where(above.any(axis=1),
+                         size - 1 - np.argmax(above[:, ::-1], axis=1), 0)
+        upper = np.minimum(lower + 1, size - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = (curve[rows, lower] - volume) / \
+                (curve[rows, lower] - curve[rows, upper])
+        doses = np.where(upper > lower,
+                         x[lower] + fraction * (x[upper] - x[lower]),
+                         x[lower])
+    return np.where(volume > counts.max(axis=1), 0.0, doses)
+
+
+# ============================ Binary DVH format =========================== #
+
+
+class DVHStore(object):
+    """Class that reads DVHs stored in the binary DVH format.
+
+    The counts and bins of all DVHs are read from contiguous arrays, i.e. a
+    single memory map of a file written by save_dvhs, and a DVH instance is
+    only created when it is accessed.
+    """
+
+    def __init__(self, buffer):
+        """Initialization for a DVHStore from a buffer in the DVH format.
+
+        Parameters
+        ----------
+        buffer : numpy array
+            uint8 array (i.e. a memmap) of data in the binary DVH format
+
+        Raises
+        ------
+        ValueError
+            Raised if the data is not in the binary DVH format
+        """
+        size = len(dvh_format_magic) + 4
+        if bytes(buffer[:len(dvh_format_magic)]) != dvh_format_magic or \
+                len(buffer) < size:
+            raise ValueError("Data is not in the binary DVH format.")
+        header_length, = struct.unpack('<I', bytes(buffer[size - 4:size]))
+        try:
+            header = json.loads(
+                bytes(buffer[size:size + header_length]).decode('utf-8'))
+            self.metadata = header['metadata']
+            arrays = {}
+            start = size + header_length
+            start += -start % 8
+            for name, (offset, dtype, length) in header['arrays'].items():
+                dtype = np.dtype(dtype)
+                offset += start
+                arrays[name] = buffer[
+                    offset:offset + length * dtype.itemsize].view(dtype)
+                if arrays[name].size != length:
+                    raise ValueError
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Data is not in the binary DVH format.")
+        self.counts = arrays['counts']
+        self.count_offsets = arrays['count_offsets']
+        self.bin_sizes = arrays['bin_sizes']
+        self.bin_starts = arrays['bin_starts']
+        self.bin_widths = arrays['bin_widths']
+        self.bins = arrays['bins']
+        # Offsets of the bins of the DVHs with non-uniform bins
+        self.bin_offsets = np.zeros(len(self.bin_sizes) + 1, dtype=np.int64)
+        np.cumsum(np.where(np.isnan(self.bin_widths), self.bin_sizes, 0),
+                  out=self.bin_offsets[1:])
+
+    def __repr__(self):
+        """String representation of the class."""
+        return 'DVHStore(%r DVHs)' % len(self)
+
+    def __len__(self):
+        """Return the number of DVHs in the store."""
+        return len(self.bin_sizes)
+
+    def __getitem__(self, index):
+        """Return the DVH at the index."""
+        if not -len(self) <= index < len(self):
+            raise IndexError("DVHStore index out of range")
+        index = index % len(self)
+        counts = self.counts[
+            self.count_offsets[index]:self.count_offsets[index + 1]]
+        if np.isnan(self.bin_widths[index]):
+            bins = self.bins[
+                self.bin_offsets[index]:self.bin_offsets[index + 1]]
+        else:
+            bins = self.bin_starts[index] + \
+                self.bin_widths[index] * np.arange(self.bin_sizes[index])
+        metadata = {k: v[index] for k, v in self.metadata.items()}
+        if metadata['color'] is not None:
+            metadata['color'] = np.array(metadata['color'])
+        return DVH(counts.astype(np.float64), bins.astype(np.float64),
+                   **metadata)
+
+    def __iter__(self):
+        """Iterate over the DVHs in the store."""
+        return (self[i] for i in range(len(self)))
+
+
+def save_dvhs(filename, dvhs):
+    """Save DVHs to a file in the binary DVH format.
+
+    Parameters
+    ----------
+    filename : str or Path
+        Location of the file to save the DVHs to
+    dvhs : iterable
+        DVH instances to save
+    """
+    with open(str(filename), 'wb') as f:
+        for chunk in _pack_dvhs(dvhs):
+            f.write(chunk)
+
+
+def load_dvhs(filename):
+    """Load DVHs from a file in the binary DVH format via a memory map.
+
+    Parameters
+    ----------
+    filename : str or Path
+        Location of a file saved by save_dvhs
+
+    Returns
+    -------
+    DVHStore
+        DVHs of the file, which are read when they are accessed
+    """
+    return DVHStore(np.memmap(str(filename), dtype=np.uint8, mode='r'))
+
+
+def _uniform_bins(bins):
+    """Return the start & width of uniform bins, otherwise (start, NaN)."""
+    if bins.size < 2:
+        return (float(bins[0]) if bins.size else 0.0), np.nan
+    width = (bins[-1] - bins[0]) / (bins.size - 1)
+    error = np.abs(bins[0] + width * np.arange(bins.size) - bins).max()
+    if width > 0 and error <= 1e-9 * np.abs(bins).max():
+        return float(bins[0]), float(width)
+    return float(bins[0]), np.nan
+
+
+def _pack_dvhs(dvhs):
+    """Return the chunks of the binary DVH format of the DVHs.
+
+    The format consists of the magic number, the length of a JSON header
+    with the metadata columns of the DVHs and the location of each array,
+    followed by the little-endian arrays, each aligned to 8 bytes.
+    """
+    metadata = {k: [] for k in DVH.attributes[2:]}
+    counts, bins, sizes, bin_sizes, starts, widths = [], [], [], [], [], []
+    for dvh in dvhs:
+        for k, column in metadata.items():
+            column.append(getattr(dvh, k))
+        counts.append(dvh.counts)
+        sizes.append(dvh.counts.size)
+        start, width = _uniform_bins(dvh.bins)
+        starts.append(start)
+        widths.append(width)
+        bin_sizes.append(dvh.bins.size)
+        if np.isnan(width):
+            bins.append(dvh.bins)
+    count_offsets = np.zeros(len(sizes) + 1, dtype='<i8')
+    np.cumsum(sizes, out=count_offsets[1:])
+    arrays = [
+        ('counts', np.concatenate(counts) if counts else [], '<f4'),
+        ('count_offsets', count_offsets, '<i8'),
+        ('bin_sizes', bin_sizes, '<i8'),
+        ('bin_starts', starts, '<f8'),
+        ('bin_widths', widths, '<f8'),
+        ('bins', np.concatenate(bins) if bins else [], '<f8')]
+    arrays = [(n, np.ascontiguousarray(a, dtype=t)) for n, a, t in arrays]
+
+    # Array offsets are relative to the (aligned) end of the header
+    locations, offset = {}, 0
+    for name, array in arrays:
+        offset += -offset % 8
+        locations[name] = [offset, array.dtype.str, array.size]
+        offset += array.nbytes
+    header = json.dumps(
+        {'metadata': metadata, 'arrays': locations},
+        separators=(',', ':'), default=_json_value).encode('utf-8')
+    header = dvh_format_magic + struct.pack('<I', len(header)) + header
+    yield header + b'\x00' * (-len(header) % 8)
+    offset = 0
+    for name, array in arrays:
+        yield b'\x00' * (-offset % 8)
+        offset += -offset % 8
+        yield array.tobytes()
+        offset += array.nbytes
+
+
+def _json_value(value):
+    """Convert numpy values (i.e. colors) to JSON serializable values."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
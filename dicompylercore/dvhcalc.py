@@ -9,18 +9,26 @@
 #    available at https://github.com/dicompyler/dicompyler-core/
 
 import numpy as np
-import numpy.ma as ma
 import matplotlib.path
 from dicompylercore import dvh
 from dicompylercore.config import skimage_available
+from dicompylercore.structure import StructureGeometry
 import collections
 try:
     from collections.abc import Sequence
 except ImportError:
     from collections import Sequence
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
 import logging
 logger = logging.getLogger('dicompylercore.dvhcalc')
 
+# Number of dose planes gathered from the dose grid at once
+DOSE_PLANE_BATCH_SIZE = 32
+
 if skimage_available:
     from skimage.transform import rescale
 
@@ -35,7 +43,8 @@ def get_dvh(structure,
             interpolation_segments_between_planes=0,
             thickness=None,
             memmap_rtdose=False,
-            callback=None):
+            callback=None,
+            rasterizer='scanline'):
     """Calculate a cumulative DVH in Gy from a DICOM RT Structure Set & Dose.
 
     Parameters
@@ -66,6 +75,9 @@ def get_dvh(structure,
         This reduces memory usage at the expense of increased calculation time.
     callback : function, optional
         A function that will be called at every iteration of the calculation.
+    rasterizer : str, optional
+        Method used to determine the dose grid points within the contours.
+        Either 'scanline' (default) or 'matplotlib'.
 
     Returns
     -------
@@ -73,27 +85,239 @@ def get_dvh(structure,
         An instance of dvh.DVH in cumulative dose. This can be converted to
         different formats using the attributes and properties of the DVH class.
     """
+    return get_dvhs(structure, dose, [roi], limit, calculate_full_volume,
+                    use_structure_extents, interpolation_resolution,
+                    interpolation_segments_between_planes, thickness,
+                    memmap_rtdose, callback,
+                    rasterizer=rasterizer)[roi]
+
+
+def get_dvhs(structure,
+             dose,
+             rois=None,
+             limit=None,
+             calculate_full_volume=True,
+             use_structure_extents=False,
+             interpolation_resolution=None,
+             interpolation_segments_between_planes=0,
+             thickness=None,
+             memmap_rtdose=False,
+             callback=None,
+             workers=None,
+             rasterizer='scanline'):
+    """Calculate cumulative DVHs in Gy for multiple ROIs in a single pass.
+
+    The RT Structure Set and RT Dose are only parsed once and the dose data,
+    LUTs and dose grid points are shared between all of the ROIs.
+
+    Parameters
+    ----------
+    structure : pydicom Dataset or filename
+        DICOM RT Structure Set used to determine the structure data.
+    dose : pydicom Dataset or filename
+        DICOM RT Dose used to determine the dose grid.
+    rois : iterable, optional
+        The ROI numbers used to uniquely identify the structures in the
+        structure set. If not provided, all structures will be calculated.
+    limit : int, optional
+        Dose limit in cGy as a maximum bin for the histogram.
+    calculate_full_volume : bool, optional
+        Calculate the full structure volume including contours outside of the
+        dose grid.
+    use_structure_extents : bool, optional
+        Limit the DVH calculation to the in-plane structure boundaries.
+    interpolation_resolution : tuple or float, optional
+        Resolution in mm (row, col) to interpolate structure and dose data to.
+        If float is provided, original dose grid pixel spacing must be square.
+    interpolation_segments_between_planes : integer, optional
+        Number of segments to interpolate between structure slices.
+    thickness : float, optional
+        Structure thickness used to calculate volume of a voxel.
+    memmap_rtdose : bool, optional
+        Use memory mapping to access the pixel array of the DICOM RT Dose.
+        This reduces memory usage at the expense of increased calculation time.
+    callback : function, optional
+        A function that will be called at every iteration of the calculation.
+        If `workers` is used, it is called once for every calculated ROI.
+    workers : int, optional
+        Number of processes used to calculate the ROIs in parallel. The RT
+        Dose pixel array is placed in shared memory (or memory mapped if
+        `memmap_rtdose` is enabled) so that it is not copied to each process.
+    rasterizer : str, optional
+        Method used to determine the dose grid points within the contours.
+        Either 'scanline' (default) or 'matplotlib'.
+
+    Returns
+    -------
+    dict
+        A dict of dvh.DVH instances in cumulative dose keyed by ROI number.
+    """
     from dicompylercore import dicomparser
 
+    if rasterizer not in ('scanline', 'matplotlib'):
+        raise AttributeError(
+            "Rasterizer must be either 'scanline' or 'matplotlib'. " +
+            "Value provided was %s." % rasterizer)
+
     rtss = dicomparser.DicomParser(structure)
     rtdose = dicomparser.DicomParser(dose, memmap_pixel_array=memmap_rtdose)
     structures = rtss.GetStructures()
-    s = structures[roi]
-    s['planes'] = rtss.GetStructureCoordinates(roi)
-    s['thickness'] = thickness if thickness else rtss.CalculatePlaneThickness(
-        s['planes'])
-
-    calcdvh = _calculate_dvh(s, rtdose, limit, calculate_full_volume,
-                             use_structure_extents, interpolation_resolution,
-                             interpolation_segments_between_planes,
-                             callback)
-    return dvh.DVH(counts=calcdvh.histogram,
-                   bins=(np.arange(0, 2) if (calcdvh.histogram.size == 1) else
-                         np.arange(0, calcdvh.histogram.size + 1) / 100),
-                   dvh_type='differential',
-                   dose_units='Gy',
-                   notes=calcdvh.notes,
-                   name=s['name']).cumulative
+    if rois is None:
+        rois = list(structures.keys())
+
+    # Dose data and the dose grid points are independent of the structure
+    dosedata, dosegridpoints = None, None
+    if hasattr(rtdose, 'pixel_array'):
+        dosedata = rtdose.GetDoseData()
+        if (rasterizer == 'matplotlib') and \
+                not (interpolation_resolution or use_structure_extents):
+            dosegridpoints = get_dose_grid_points(dosedata)
+
+    # Parse the contours of all ROIs in a single pass of the structure set
+    geometries = rtss.GetStructureGeometries(rois)
+    for roi in rois:
+        s = structures[roi]
+        s['planes'] = geometries[roi]
+        s['thickness'] = thickness if thickness else \
+            rtss.CalculatePlaneThickness(s['planes'])
+
+    options = (limit, calculate_full_volume, use_structure_extents,
+               interpolation_resolution, interpolation_segments_between_planes)
+    if workers and (workers > 1) and (len(rois) > 1) and dosedata:
+        calcdvhs = _calculate_dvhs_parallel(
+            [structures[roi] for roi in rois], rtdose, options, workers,
+            callback, dosedata, dosegridpoints, rasterizer)
+    else:
+        calcdvhs = [_calculate_dvh(structures[roi], rtdose, *options,
+                                   callback, dosedata, dosegridpoints,
+                                   rasterizer)
+                    for roi in rois]
+
+    dvhs = {}
+    for roi, (notes, histogram) in zip(rois, calcdvhs):
+        dvhs[roi] = dvh.DVH(
+            counts=histogram,
+            bins=(np.arange(0, 2) if (histogram.size == 1) else
+                  np.arange(0, histogram.size + 1) / 100),
+            dvh_type='differential',
+            dose_units='Gy',
+            notes=notes,
+            name=structures[roi]['name']).cumulative
+    return dvhs
+
+
+# RT Dose and shared dose data used by each DVH calculation worker process
+_worker_state = None
+
+
+def _calculate_dvhs_parallel(structures,
+                             dose,
+                             options,
+                             workers,
+                             callback=None,
+                             dose_data=None,
+                             dose_grid_points=None,
+                             rasterizer='scanline'):
+    """Calculate differential DVHs for structures using a process pool.
+
+    Parameters
+    ----------
+    structures : list
+        Structures (ROIs) including `planes` and `thickness` keys.
+    dose : DicomParser
+        A DicomParser instance of an RT Dose.
+    options : tuple
+        Positional calculation options passed to `_calculate_dvh`.
+    workers : int
+        Number of worker processes.
+    callback : function, optional
+        A function that will be called once for every calculated structure.
+    dose_data : dict, optional
+        Dose data from dicomparser.GetDoseData.
+    dose_grid_points : ndarray, optional
+        Dose grid points from get_dose_grid_points for the full dose grid.
+    rasterizer : str, optional
+        Either 'scanline' (default) or 'matplotlib'.
+
+    Returns
+    -------
+    list
+        A list of (notes, histogram) tuples in the order of `structures`.
+    """
+    shm = None
+    if dose.memmap_pixel_array:
+        # Each worker memory maps the RT Dose file read-only
+        initargs = (dose.filename, True, None)
+    else:
+        pixel_array = dose.GetPixelArray()
+        if shared_memory is not None:
+            shm = shared_memory.SharedMemory(
+                create=True, size=max(pixel_array.nbytes, 1))
+            shared = np.ndarray(
+                pixel_array.shape, dtype=pixel_array.dtype, buffer=shm.buf)
+            shared[:] = pixel_array
+            pixel_data = (shm.name, pixel_array.shape, pixel_array.dtype.str)
+        else:
+            pixel_data = pixel_array
+        initargs = (_get_dataset_header(dose.ds), False, pixel_data)
+
+    try:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_dvh_worker,
+                initargs=initargs + (dose_data, dose_grid_points)) as ex:
+            calcdvhs = []
+            for n, calcdvh in enumerate(ex.map(
+                    _calculate_dvh_worker, structures,
+                    [options] * len(structures),
+                    [rasterizer] * len(structures))):
+                calcdvhs.append(calcdvh)
+                if callback:
+                    callback(n + 1, len(structures))
+    finally:
+        if shm is not None:
+            del shared
+            shm.close()
+            shm.unlink()
+    return calcdvhs
+
+
+def _get_dataset_header(ds):
+    """Return a copy of the dataset without the Pixel Data element."""
+    from pydicom.dataset import Dataset
+
+    header = Dataset({tag: ds[tag] for tag in ds.keys()
+                      if tag != 0x7fe00010})
+    header.file_meta = ds.file_meta
+    header.is_little_endian = ds.is_little_endian
+    header.is_implicit_VR = ds.is_implicit_VR
+    return header
+
+
+def _init_dvh_worker(dataset, memmap, pixel_data, dose_data,
+                     dose_grid_points):
+    """Initialize the RT Dose used by a DVH calculation worker process."""
+    global _worker_state
+    from dicompylercore import dicomparser
+
+    rtdose = dicomparser.DicomParser(dataset, memmap_pixel_array=memmap)
+    shm = None
+    if isinstance(pixel_data, tuple):
+        name, shape, dtype = pixel_data
+        shm = shared_memory.SharedMemory(name=name)
+        pixel_data = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if pixel_data is not None:
+        pixel_data.flags.writeable = False
+        rtdose.pixel_array = pixel_data
+    _worker_state = (rtdose, shm, dose_data, dose_grid_points)
+
+
+def _calculate_dvh_worker(structure, options, rasterizer):
+    """Calculate a differential DVH within a worker process."""
+    rtdose, _, dose_data, dose_grid_points = _worker_state
+    calcdvh = _calculate_dvh(structure, rtdose, *options, None,
+                             dose_data, dose_grid_points, rasterizer)
+    return calcdvh.notes, calcdvh.histogram
 
 
 def _calculate_dvh(structure,
@@ -103,7 +327,10 @@ def _calculate_dvh(structure,
                    use_structure_extents=False,
                    interpolation_resolution=None,
                    interpolation_segments_between_planes=0,
-                   callback=None):
+                   callback=None,
+                   dose_data=None,
+                   dose_grid_points=None,
+                   rasterizer='scanline'):
     """Calculate a differential DVH for the given structure and dose grid.
 
     Parameters
@@ -127,6 +354,14 @@ def _calculate_dvh(structure,
         Number of segments to interpolate between structure slices.
     callback : function, optional
         A function that will be called at every iteration of the calculation.
+    dose_data : dict, optional
+        Dose data from dicomparser.GetDoseData, used to avoid re-reading the
+        dose data for every structure.
+    dose_grid_points : ndarray, optional
+        Dose grid points from get_dose_grid_points for the full dose grid.
+    rasterizer : str, optional
+        Method used to determine the dose grid points within the contours.
+        Either 'scanline' (default) or 'matplotlib'.
 
     Returns
     -------
@@ -135,67 +370,156 @@ def _calculate_dvh(structure,
 
     Notes
     -----
-    This is an internal function called by `get_dvh` and
+    This is an internal function called by `get_dvh` and `get_dvhs` and
     should not be called directly.
     """
     calcdvh = collections.namedtuple('DVH', ['notes', 'histogram'])
     logger.debug("Calculating DVH of %s %s", structure['id'],
                  structure['name'])
-    planes = collections.OrderedDict(sorted(structure["planes"].items()))
 
-    # Create an empty array of bins to store the histogram in cGy
-    # only if the structure has contour data or the dose grid exists
-    if ((len(planes)) and (hasattr(dose, 'pixel_array'))):
-
-        # Get the dose and image data information
-        dd = dose.GetDoseData()
-        id = dose.GetImageData()
-
-        # Determine structure and respectively dose grid extents
-        if interpolation_resolution or use_structure_extents:
-            extents = []
-            if use_structure_extents:
-                extents = structure_extents(structure['planes'])
-            dgindexextents = dosegrid_extents_indices(extents, dd)
-            dgextents = dosegrid_extents_positions(dgindexextents, dd)
-            # Determine LUT from extents
-            if use_structure_extents:
-                dd['lut'] = \
-                    (dd['lut'][0][dgindexextents[0]:dgindexextents[2]],
-                     dd['lut'][1][dgindexextents[1]:dgindexextents[3]])
-            # If interpolation is enabled, generate new LUT from extents
-            if interpolation_resolution:
-                dd['lut'] = get_resampled_lut(
-                    dgindexextents,
-                    dgextents,
-                    new_pixel_spacing=interpolation_resolution,
-                    min_pixel_spacing=id['pixelspacing'])
-            dd['rows'] = dd['lut'][1].shape[0]
-            dd['columns'] = dd['lut'][0].shape[0]
-
-        # Generate a 2d mesh grid to create a polygon mask in dose coordinates
-        # Code taken from Stack Overflow Answer from Joe Kington:
-        # https://stackoverflow.com/q/3654289/74123
-        # Create vertex coordinates for each grid cell
-        x_index = dd['x_lut_index']
-        x, y = np.meshgrid(
-            np.array(dd['lut'][x_index]), np.array(dd['lut'][1-x_index])
-        )
-        x, y = x.flatten(), y.flatten()
-        dosegridpoints = np.vstack((x, y)).T
-
-        maxdose = int(dd['dosemax'] * dd['dosegridscaling'] * 100) + 1
-        # Remove values above the limit (cGy) if specified
-        if isinstance(limit, int):
-            if (limit < maxdose):
-                maxdose = limit
-        hist = np.zeros(maxdose)
+    # Accumulate the histogram and volume of each plane in place
+    hist = None
+    volume = 0
+    notes = None
+    for planedvh in calculate_plane_histograms(
+            structure, dose, limit, calculate_full_volume,
+            use_structure_extents, interpolation_resolution,
+            interpolation_segments_between_planes, callback,
+            dose_data, dose_grid_points, rasterizer):
+        if hist is None:
+            hist = planedvh.histogram.copy()
+        else:
+            hist += planedvh.histogram
+        volume += planedvh.volume
+        if planedvh.notes:
+            notes = planedvh.notes
+    if hist is None:
+        return calcdvh('Empty DVH', np.array([0]))
+
+    # Volume units are given in cm^3
+    volume = volume / 1000
+    # Rescale the histogram to reflect the total volume
+    if hist.max() > 0:
+        hist = hist * volume / hist.sum()
     else:
         return calcdvh('Empty DVH', np.array([0]))
+    # Remove the bins above the max dose for the structure
+    hist = np.trim_zeros(hist, trim='b')
+
+    return calcdvh(notes, hist)
+
+
+PlaneHistogram = collections.namedtuple(
+    'PlaneHistogram', ['z', 'histogram', 'volume', 'notes'])
+
+
+def calculate_plane_histograms(structure,
+                               dose,
+                               limit=None,
+                               calculate_full_volume=True,
+                               use_structure_extents=False,
+                               interpolation_resolution=None,
+                               interpolation_segments_between_planes=0,
+                               callback=None,
+                               dose_data=None,
+                               dose_grid_points=None,
+                               rasterizer='scanline'):
+    """Generate the differential histogram of each plane of a structure.
+
+    Only the histogram of the current plane is held in memory, so the
+    per-plane contributions to a DVH can be inspected or accumulated
+    without storing the histograms of every plane.
+
+    Parameters
+    ----------
+    structure : dict
+        A structure (ROI) from an RT Structure Set parsed using DicomParser.
+        The dictionary must include `planes` from GetStructureGeometry or
+        GetStructureCoordinates and a `thickness` key with a thickness `float`.
+    dose : DicomParser
+        A DicomParser instance of an RT Dose
+    limit : int, optional
+        Dose limit in cGy as a maximum bin for the histogram.
+    calculate_full_volume : bool, optional
+        Calculate the full structure volume including contours outside of the
+        dose grid.
+    use_structure_extents : bool, optional
+        Limit the DVH calculation to the in-plane structure boundaries.
+    interpolation_resolution : tuple or float, optional
+        Resolution in mm (row, col) to interpolate structure and dose data to.
+        If float is provided, original dose grid pixel spacing must be square.
+    interpolation_segments_between_planes : integer, optional
+        Number of segments to interpolate between structure slices.
+    callback : function, optional
+        A function that will be called at every iteration of the calculation.
+    dose_data : dict, optional
+        Dose data from dicomparser.GetDoseData, used to avoid re-reading the
+        dose data for every structure.
+    dose_grid_points : ndarray, optional
+        Dose grid points from get_dose_grid_points for the full dose grid.
+    rasterizer : str, optional
+        Method used to determine the dose grid points within the contours.
+        Either 'scanline' (default) or 'matplotlib'.
+
+    Yields
+    ------
+    PlaneHistogram
+        A named tuple of the plane position (z), the differential histogram
+        with 1 cGy bins, the volume in mm^3 and notes for the plane.
+        Nothing is yielded if the structure has no contour data or there is
+        no dose grid.
+    """
+    planes = collections.OrderedDict(sorted(structure["planes"].items()))
+
+    # Only calculate the histograms if the structure has contour data
+    # and the dose grid exists
+    if not ((len(planes)) and (hasattr(dose, 'pixel_array'))):
+        return
+
+    # Get the dose and image data information
+    # Copy the shared dose data since the LUT may be modified below
+    dd = dict(dose_data) if dose_data is not None else dose.GetDoseData()
+    id = dose.GetImageData()
+
+    # Determine structure and respectively dose grid extents
+    if interpolation_resolution or use_structure_extents:
+        extents = []
+        if use_structure_extents:
+            extents = structure_extents(structure['planes'])
+        dgindexextents = dosegrid_extents_indices(extents, dd)
+        dgextents = dosegrid_extents_positions(dgindexextents, dd)
+        # Determine LUT from extents
+        if use_structure_extents:
+            dd['lut'] = \
+                (dd['lut'][0][dgindexextents[0]:dgindexextents[2]],
+                 dd['lut'][1][dgindexextents[1]:dgindexextents[3]])
+        # If interpolation is enabled, generate new LUT from extents
+        if interpolation_resolution:
+            dd['lut'] = get_resampled_lut(
+                dgindexextents,
+                dgextents,
+                new_pixel_spacing=interpolation_resolution,
+                min_pixel_spacing=id['pixelspacing'])
+        dd['rows'] = dd['lut'][1].shape[0]
+        dd['columns'] = dd['lut'][0].shape[0]
+
+    # Dose grid points are only used to create a matplotlib polygon mask
+    dosegridpoints = None
+    if rasterizer == 'matplotlib':
+        if (dose_grid_points is not None) and \
+                not (interpolation_resolution or use_structure_extents):
+            dosegridpoints = dose_grid_points
+        else:
+            dosegridpoints = get_dose_grid_points(dd)
+
+    # Number of 1 cGy bins used to store the histogram
+    maxdose = int(dd['dosemax'] * dd['dosegridscaling'] * 100) + 1
+    # Remove values above the limit (cGy) if specified
+    if isinstance(limit, int):
+        if (limit < maxdose):
+            maxdose = limit
 
     n = 0
-    notes = None
-    planedata = {}
     # Interpolate between planes in the direction of the structure
     if interpolation_segments_between_planes:
         planes = interpolate_between_planes(
@@ -205,21 +529,21 @@ def _calculate_dvh(structure,
             'thickness'] / (interpolation_segments_between_planes + 1)
 
     # Iterate over each plane in the structure
-    for z, plane in planes.items():
+    for z, plane, doseplane in _iterate_dose_planes(dose, planes):
+        notes = None
         # Get the dose plane for the current structure plane
-        if interpolation_resolution or use_structure_extents:
+        if doseplane.size and \
+                (interpolation_resolution or use_structure_extents):
             doseplane = get_interpolated_dose(
-                dose, z, interpolation_resolution, dgindexextents)
-        else:
-            doseplane = dose.GetDoseGrid(z)
+                dose, z, interpolation_resolution, dgindexextents, doseplane)
         if doseplane.size:
-            planedata[z] = calculate_plane_histogram(plane, doseplane,
-                                                     dosegridpoints, maxdose,
-                                                     dd, id, structure, hist)
-            # print(f'Slice: {z}, volume: {planedata[z][1]}')
+            hist, vol = calculate_plane_histogram(
+                plane, doseplane, dosegridpoints, maxdose,
+                dd, id, structure, None, rasterizer)
         else:
             # If the dose plane is not found, still perform the calculation
             # but only use it to calculate the volume for the slice
+            hist, vol = np.zeros(maxdose, dtype=np.intp), 0
             if not calculate_full_volume:
                 logger.warning('Dose plane not found for %s. Contours' +
                                ' not used for volume calculation.', z)
@@ -242,41 +566,92 @@ def _calculate_dvh(structure,
                     ]
                 _, vol = calculate_plane_histogram(
                     plane, dummy_dose, dosegridpoints, maxdose,
-                    dd, id, structure, hist)
-                planedata[z] = (np.array([0]), vol)
+                    dd, id, structure, None, rasterizer)
                 notes = 'Dose grid does not encompass every contour.' + \
                     ' Volume calculated for all contours.'
         n += 1
         if callback:
             callback(n, len(planes))
-    # Volume units are given in cm^3
-    volume = sum([p[1] for p in planedata.values()]) / 1000
-    # print(f'total volume: {volume}')
-    # Rescale the histogram to reflect the total volume
-    hist = sum([p[0] for p in planedata.values()])
-    if hist.max() > 0:
-        hist = hist * volume / sum(hist)
-    else:
-        return calcdvh('Empty DVH', np.array([0]))
-    # Remove the bins above the max dose for the structure
-    hist = np.trim_zeros(hist, trim='b')
+        yield PlaneHistogram(z, hist, vol, notes)
 
-    return calcdvh(notes, hist)
+
+def _iterate_dose_planes(dose, planes, batch_size=DOSE_PLANE_BATCH_SIZE):
+    """Generate the dose plane for each structure plane.
+
+    The dose planes are gathered from the dose grid in batches of structure
+    planes to limit the memory used for large structures.
+
+    Parameters
+    ----------
+    dose : DicomParser
+        A DicomParser instance of an RT Dose.
+    planes : dict
+        Structure planes keyed by z position.
+    batch_size : int, optional
+        Number of dose planes gathered at once.
+
+    Yields
+    ------
+    tuple
+        z position, structure plane and dose plane. The dose plane is empty
+        if the z position is outside of the dose grid.
+    """
+    items = list(planes.items())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        doseplanes = dose.GetDosePlanes([float(z) for z, _ in batch])
+        for (z, plane), doseplane in zip(batch, doseplanes):
+            # Dose planes outside of the dose grid are entirely NaN
+            if np.isnan(doseplane[0, 0]):
+                doseplane = np.array([])
+            yield z, plane, doseplane
+
+
+def get_dose_grid_points(dd):
+    """Generate the dose grid points used to create a polygon mask.
+
+    Parameters
+    ----------
+    dd : dict
+        Dose data from dicomparser.GetDoseData.
+
+    Returns
+    -------
+    ndarray
+        An (n, 2) array of the (x, y) patient coordinates of each dose grid
+        point.
+    """
+    # Generate a 2d mesh grid to create a polygon mask in dose coordinates
+    # Code taken from Stack Overflow Answer from Joe Kington:
+    # https://stackoverflow.com/q/3654289/74123
+    # Create vertex coordinates for each grid cell
+    x_index = dd['x_lut_index']
+    x, y = np.meshgrid(
+        np.array(dd['lut'][x_index]), np.array(dd['lut'][1-x_index])
+    )
+    x, y = x.flatten(), y.flatten()
+    return np.vstack((x, y)).T
 
 
 def calculate_plane_histogram(plane, doseplane, dosegridpoints, maxdose, dd,
-                              id, structure, hist):
+                              id, structure, hist, rasterizer='scanline'):
     """Calculate the DVH for the given plane in the structure."""
-    contours = [[x[0:2] for x in c['data']] for c in plane]
+    # Contours are either point arrays or dicts from GetStructureCoordinates
+    contours = [c[:, 0:2] if isinstance(c, np.ndarray) else
+                [x[0:2] for x in c['data']] for c in plane]
 
-    # Create a zero valued bool grid
-    grid = np.zeros((dd['rows'], dd['columns']), dtype=np.uint8)
+    if rasterizer == 'scanline':
+        # Holes are removed by the even-odd rule of the scanline fill
+        grid = get_scanline_mask(dd, contours)
+    else:
+        # Create a zero valued bool grid
+        grid = np.zeros((dd['rows'], dd['columns']), dtype=np.uint8)
 
-    # Calculate the dose plane mask for each contour in the plane
-    # and boolean xor to remove holes
-    for i, contour in enumerate(contours):
-        m = get_contour_mask(dd, id, dosegridpoints, contour)
-        grid = np.logical_xor(m.astype(np.uint8), grid).astype(np.bool_)
+        # Calculate the dose plane mask for each contour in the plane
+        # and boolean xor to remove holes
+        for i, contour in enumerate(contours):
+            m = get_contour_mask(dd, id, dosegridpoints, contour)
+            grid = np.logical_xor(m.astype(np.uint8), grid).astype(np.bool_)
 
     hist, vol = calculate_contour_dvh(grid, doseplane, maxdose, dd, id,
                                       structure)
@@ -284,43 +659,145 @@ def calculate_plane_histogram(plane, doseplane, dosegridpoints, maxdose, dd,
 
 
 def get_contour_mask(dd, id, dosegridpoints, contour):
-    """Get the mask for the contour with respect to the dose plane."""
+    """Get the mask for the contour with respect to the dose plane.
+
+    Only the dose grid points within the bounding box of the contour are
+    tested and the result is placed into the mask of the dose plane.
+    """
     doselut = dd['lut']
+    x_index = dd['x_lut_index']
 
     c = matplotlib.path.Path(list(contour))
 
-    # def inpolygon(polygon, xp, yp):
-    #     return np.array(
-    #         [Point(x, y).intersects(polygon) for x, y in zip(xp, yp)],
-    #         dtype=np.bool)
+    grid = np.zeros((len(doselut[1]), len(doselut[0])), dtype=np.bool_)
 
-    # p = Polygon(contour)
-    # x, y = np.meshgrid(np.array(dd['lut'][0]), np.array(dd['lut'][1]))
-    # mask = inpolygon(p, x.ravel(), y.ravel())
-    # return mask.reshape((len(doselut[1]), len(doselut[0])))
+    # Determine the bounding box of the contour as dose grid indices
+    cols = get_lut_index_range(doselut[0], c.vertices[:, x_index])
+    rows = get_lut_index_range(doselut[1], c.vertices[:, 1 - x_index])
+    if cols is None or rows is None:
+        return grid
 
-    grid = c.contains_points(dosegridpoints)
-    if dd['x_lut_index'] == 0:  # X values across columns
-        grid = grid.reshape((len(doselut[1]), len(doselut[0])))
+    if x_index == 0:  # X values across columns
+        points = dosegridpoints.reshape(
+            (len(doselut[1]), len(doselut[0]), 2))[rows, cols]
+        grid[rows, cols] = c.contains_points(
+            points.reshape((-1, 2))).reshape(points.shape[0:2])
     else:  # decubitus
-        grid = grid.reshape((len(doselut[0]), len(doselut[1]))).T
+        points = dosegridpoints.reshape(
+            (len(doselut[0]), len(doselut[1]), 2))[cols, rows]
+        grid[rows, cols] = c.contains_points(
+            points.reshape((-1, 2))).reshape(points.shape[0:2]).T
 
     return grid
 
 
+def get_lut_index_range(lut, positions):
+    """Get the range of LUT indices that lie within the given positions.
+
+    Parameters
+    ----------
+    lut : ndarray
+        Monotonic LUT of patient coordinates for a dose grid axis.
+    positions : ndarray
+        Patient coordinates along the same axis, i.e. contour vertices.
+
+    Returns
+    -------
+    slice or None
+        A slice of the LUT indices between the minimum and maximum positions
+        or None if no LUT positions lie within them.
+    """
+    lut = np.asarray(lut)
+    indices = np.flatnonzero(
+        (lut >= np.amin(positions)) & (lut <= np.amax(positions)))
+    if not indices.size:
+        return None
+    return slice(indices[0], indices[-1] + 1)
+
+
+def get_scanline_mask(dd, contours):
+    """Get the even-odd mask of the contours with respect to the dose plane.
+
+    The contours are rasterized with a scanline fill directly in dose grid
+    index space. For every contour edge, the dose grid rows it spans are
+    determined from the row LUT and the column of each edge / row crossing
+    is toggled. A cumulative sum along each row then fills the columns that
+    lie inside an odd number of contours, which also removes holes.
+
+    Parameters
+    ----------
+    dd : dict
+        Dose data from dicomparser.GetDoseData.
+    contours : list
+        Contours in the plane, each a sequence of (x, y) patient coordinates.
+
+    Returns
+    -------
+    ndarray
+        A boolean mask with the shape of the dose plane (rows, columns).
+    """
+    x_index = dd['x_lut_index']
+    col_lut = np.asarray(dd['lut'][0], dtype=np.float64)
+    row_lut = np.asarray(dd['lut'][1], dtype=np.float64)
+    num_cols, num_rows = col_lut.size, row_lut.size
+
+    # Mirror the coordinates if the LUT positions decrease with the index
+    col_sign = -1.0 if (num_cols > 1) and (col_lut[-1] < col_lut[0]) else 1.0
+    row_sign = -1.0 if (num_rows > 1) and (row_lut[-1] < row_lut[0]) else 1.0
+    col_lut = col_lut * col_sign
+    row_lut = row_lut * row_sign
+
+    crossings = []
+    for contour in contours:
+        c = np.asarray(contour, dtype=np.float64)
+        if c.ndim != 2 or c.shape[0] < 3:
+            continue
+        x0 = c[:, x_index] * col_sign
+        y0 = c[:, 1 - x_index] * row_sign
+        x1 = np.roll(x0, -1)
+        y1 = np.roll(y0, -1)
+
+        # Each edge crosses the rows where min(y0, y1) <= y < max(y0, y1)
+        start = np.searchsorted(row_lut, np.minimum(y0, y1), side='left')
+        stop = np.searchsorted(row_lut, np.maximum(y0, y1), side='left')
+        counts = stop - start
+        total = counts.sum()
+        if not total:
+            continue
+        edges = np.repeat(np.arange(counts.size), counts)
+        rows = start[edges] + np.arange(total) - \
+            np.repeat(np.cumsum(counts) - counts, counts)
+
+        # Column position of the crossing and first column to the right of it
+        t = (row_lut[rows] - y0[edges]) / (y1[edges] - y0[edges])
+        x = x0[edges] + t * (x1[edges] - x0[edges])
+        cols = np.searchsorted(col_lut, x, side='right')
+        crossings.append(rows * (num_cols + 1) + cols)
+
+    if not crossings:
+        return np.zeros((num_rows, num_cols), dtype=np.bool_)
+
+    toggles = np.bincount(np.concatenate(crossings),
+                          minlength=num_rows * (num_cols + 1))
+    toggles = toggles.reshape((num_rows, num_cols + 1))[:, :-1]
+    return (np.cumsum(toggles, axis=1) & 1).astype(np.bool_)
+
+
 def calculate_contour_dvh(mask, doseplane, maxdose, dd, id, structure):
     """Calculate the differential DVH for the given contour and dose plane."""
-    # Multiply the structure mask by the dose plane to get the dose mask
-    mask = ma.array(doseplane * dd['dosegridscaling'] * 100, mask=~mask)
-    # Calculate the differential dvh
-    hist, edges = np.histogram(mask.compressed(),
-                               bins=maxdose,
-                               range=(0, maxdose))
+    # Gather the dose (cGy) of the dose grid points within the structure mask
+    dose = doseplane[mask] * dd['dosegridscaling'] * 100
+    # Calculate the differential dvh using 1 cGy bins ranging from 0 to
+    # maxdose, where a dose equal to maxdose is counted in the last bin
+    dose = dose[(dose >= 0) & (dose <= maxdose)]
+    bins = dose.astype(np.intp)
+    bins[bins == maxdose] = maxdose - 1
+    hist = np.bincount(bins, minlength=maxdose)
 
     # Calculate the volume for the contour for the given dose plane
-    vol = sum(hist) * (abs(np.mean(np.diff(dd['lut'][0]))) *
-                       abs(np.mean(np.diff(dd['lut'][1]))) *
-                       (structure['thickness']))
+    vol = hist.sum() * (abs(np.mean(np.diff(dd['lut'][0]))) *
+                        abs(np.mean(np.diff(dd['lut'][1]))) *
+                        (structure['thickness']))
     return hist, vol
 
 
@@ -329,25 +806,16 @@ def structure_extents(coords):
 
     Parameters
     ----------
-    coords : dict
-        Structure coordinates from dicomparser.GetStructureCoordinates.
+    coords : dict or StructureGeometry
+        Structure coordinates from dicomparser.GetStructureCoordinates or
+        dicomparser.GetStructureGeometry.
 
     Returns
     -------
     list
         Structure extents in patient coordintes: [xmin, ymin, xmax, ymax].
     """
-    bounds = []
-    for z in sorted(coords.items()):
-        contours = [[x[0:2] for x in c['data']] for c in z[1]]
-        for contour in contours:
-            x, y = np.array([x[0:1] for x in contour]), np.array(
-                [x[1:2] for x in contour])
-            bounds.append([np.min(x), np.min(y), np.max(x), np.max(y)])
-    extents = np.array(bounds)
-    return np.array(
-        [np.amin(extents, axis=0)[0:2],
-         np.amax(extents, axis=0)[2:4]]).flatten().tolist()
+    return StructureGeometry.from_dict(coords).extents()
 
 
 def dosegrid_extents_indices(extents, dd, padding=1):
@@ -507,7 +975,7 @@ def get_resampled_lut(index_extents,
     return col_lut, row_lut
 
 
-def get_interpolated_dose(dose, z, resolution, extents):
+def get_interpolated_dose(dose, z, resolution, extents, dose_plane=None):
     """Get interpolated dose for the given z, resolution & array extents.
 
     Parameters
@@ -521,6 +989,8 @@ def get_interpolated_dose(dose, z, resolution, extents):
         Provided in (row, col) format.
     extents : list
         Dose grid index extents.
+    dose_plane : ndarray, optional
+        Dose plane at z if already retrieved from the dose grid.
 
     Returns
     -------
@@ -528,7 +998,7 @@ def get_interpolated_dose(dose, z, resolution, extents):
         Interpolated dose grid with a shape larger than the input dose grid.
     """
     # Return the dose bounded by extents if interpolation is not required
-    d = dose.GetDoseGrid(z)
+    d = dose.GetDoseGrid(z) if dose_plane is None else dose_plane
     if not d.size:
         return d  # cannot take 2d index below if empty
     extent_dose = d[extents[1]:extents[3],
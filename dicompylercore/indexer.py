@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# indexer.py
+"""Index the DICOM / DICOM RT files of a directory in a SQLite database."""
+# Copyright (c) 2026 dicompyler-core contributors
+# This file is part of dicompyler-core, released under a BSD license.
+#    See the file license.txt included with this distribution, also
+#    available at https://github.com/dicompyler/dicompyler-core/
+
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pydicom import dcmread
+from dicompylercore import dicomparser
+
+logger = logging.getLogger('dicompylercore.indexer')
+
+# Header attributes read from each file, all others (including pixel data
+# and contour data) are skipped
+header_tags = [
+    'SOPClassUID', 'SOPInstanceUID', 'Modality',
+    'PatientName', 'PatientID', 'PatientBirthDate', 'PatientSex',
+    'StudyInstanceUID', 'StudyDescription', 'StudyDate', 'StudyTime',
+    'SeriesInstanceUID', 'SeriesDescription', 'SeriesDate', 'SeriesTime',
+    'InstanceCreationDate', 'InstanceCreationTime', 'FrameOfReferenceUID',
+    'ImagePositionPatient', 'ImageOrientationPatient', 'PatientPosition',
+    'ReferencedFrameOfReferenceSequence', 'ReferencedStructureSetSequence',
+    'ReferencedRTPlanSequence']
+
+schema = """
+CREATE TABLE IF NOT EXISTS patients (
+    id TEXT PRIMARY KEY, name TEXT, birth_date TEXT, gender TEXT);
+CREATE TABLE IF NOT EXISTS studies (
+    id TEXT PRIMARY KEY, patient_id TEXT, description TEXT, date TEXT,
+    time TEXT);
+CREATE TABLE IF NOT EXISTS series (
+    id TEXT PRIMARY KEY, study_id TEXT, modality TEXT, description TEXT,
+    date TEXT, time TEXT, referenceframe TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, mtime REAL, size INTEGER, series_id TEXT,
+    sop_instance_uid TEXT, sop_class TEXT, image_location REAL);
+CREATE TABLE IF NOT EXISTS refs (
+    path TEXT, type TEXT, uid TEXT);
+CREATE INDEX IF NOT EXISTS files_series ON files (series_id);
+CREATE INDEX IF NOT EXISTS files_instance ON files (sop_instance_uid);
+CREATE INDEX IF NOT EXISTS refs_path ON refs (path);
+CREATE INDEX IF NOT EXISTS refs_uid ON refs (type, uid);
+"""
+
+
+def read_header(filename):
+    """Read the header attributes used to index a DICOM file.
+
+    Parameters
+    ----------
+    filename : str
+        DICOM file location
+
+    Returns
+    -------
+    dict or None
+        Patient, study, series and instance information as well as the
+        referenced series, structure set and RT plan UIDs. None if the file
+        cannot be read or is not a DICOM file.
+    """
+    try:
+        with open(filename, "rb") as fp:
+            ds = dcmread(fp, force=True, stop_before_pixels=True,
+                         specific_tags=header_tags)
+        if "SOPClassUID" not in ds or "SOPInstanceUID" not in ds:
+            return None
+        dp = dicomparser.DicomParser(ds)
+        series = dp.GetSeriesInfo()
+        study = dp.GetStudyInfo()
+        location = None
+        if 'ImagePositionPatient' in ds and 'ImageOrientationPatient' in ds:
+            location = float(dp.GetImageLocation())
+        return {
+            'patient': dp.GetDemographics(),
+            'study': {
+                'id': ds.get('StudyInstanceUID', ''),
+                'description': study['description'],
+                'date': study['date'],
+                'time': study['time']},
+            'series': {
+                'id': ds.get('SeriesInstanceUID', ''),
+                'modality': series['modality'],
+                'description': series['description'],
+                'date': series['date'],
+                'time': series['time'],
+                'referenceframe': dp.GetFrameOfReferenceUID()},
+            'sop_instance_uid': dp.GetSOPInstanceUID(),
+            'sop_class': dp.GetSOPClassUID(),
+            'image_location': location,
+            'references': {
+                'series': dp.GetReferencedSeries() or '',
+                'rtss': dp.GetReferencedStructureSet(),
+                'rtplan': dp.GetReferencedRTPlan()}}
+    except Exception as e:
+        logger.debug('%s could not be indexed: %s', filename, e)
+        return None
+
+
+class DicomIndex:
+    """Class that indexes DICOM / DICOM RT files in a SQLite database."""
+
+    def __init__(self, database=':memory:'):
+        """Initialize a DicomIndex from a SQLite database.
+
+        Parameters
+        ----------
+        database : str or Path, optional
+            SQLite database location, which is created if it doesn't exist.
+            By default the index is only kept in memory.
+        """
+        self.connection = sqlite3.connect(str(database))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the SQLite database."""
+        self.connection.close()
+
+    def update(self, directory, workers=None, callback=None):
+        """Index the DICOM files within a directory and its subdirectories.
+
+        Only files that were added or modified (by mtime & size) since the
+        last update are read. Files that no longer exist are removed from
+        the index.
+
+        Parameters
+        ----------
+        directory : str or Path
+            Directory to index
+        workers : int, optional
+            Number of threads used to read the file headers, by default
+            determined by ThreadPoolExecutor
+        callback : function, optional
+            A function that will be called after each file header is read
+
+        Returns
+        -------
+        dict
+            Number of files that were added, updated, removed & unchanged
+        """
+        directory = os.path.abspath(directory)
+        stats = {}
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                stats[path] = (stat.st_mtime, stat.st_size)
+
+        prefix = os.path.join(directory, '')
+        indexed = {
+            row['path']: (row['mtime'], row['size'])
+            for row in self.connection.execute(
+                "SELECT path, mtime, size FROM files "
+                "WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))}
+        modified = [p for p, s in stats.items() if indexed.get(p) != s]
+        removed = [p for p in indexed if p not in stats]
+        counts = {
+            'added': len([p for p in modified if p not in indexed]),
+            'updated': len([p for p in modified if p in indexed]),
+            'removed': len(removed),
+            'unchanged': len(stats) - len(modified)}
+
+        with self.connection:
+            self._remove(removed + modified)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for n, (path, header) in enumerate(zip(
+                        modified, executor.map(read_header, modified))):
+                    self._insert(path, stats[path], header)
+                    if callback:
+                        callback(n + 1, len(modified))
+            self._remove_orphans()
+        return counts
+
+    def _insert(self, path, stat, header):
+        """Insert the header information of a file into the index."""
+        mtime, size = stat
+        # Files that aren't DICOM are still indexed to avoid re-reading them
+        if header is None:
+            self.connection.execute(
+                "INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                (path, mtime, size))
+            return
+        patient, study, series = \
+            header['patient'], header['study'], header['series']
+        self.connection.execute(
+            "INSERT OR REPLACE INTO patients VALUES (?, ?, ?, ?)",
+            (patient['id'], patient['name'], patient['birth_date'],
+             patient['gender']))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO studies VALUES (?, ?, ?, ?, ?)",
+            (study['id'], patient['id'], study['description'],
+             study['date'], study['time']))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (series['id'], study['id'], series['modality'],
+             series['description'], series['date'], series['time'],
+             series['referenceframe']))
+        self.connection.execute(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, mtime, size, series['id'], header['sop_instance_uid'],
+             header['sop_class'], header['image_location']))
+        self.connection.executemany(
+            "INSERT INTO refs VALUES (?, ?, ?)",
+            [(path, t, uid) for t, uid in header['references'].items()
+             if uid])
+
+    def _remove(self, paths):
+        """Remove files from the index."""
+        self.connection.executemany(
+            "DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+        self.connection.executemany(
+            "DELETE FROM refs WHERE path = ?", [(p,) for p in paths])
+
+    def _remove_orphans(self):
+        """Remove series, studies & patients that no longer have files."""
+        self.connection.execute(
+            "DELETE FROM series WHERE id NOT IN "
+            "(SELECT series_id FROM files WHERE series_id IS NOT NULL)")
+        self.connection.execute(
+            "DELETE FROM studies WHERE id NOT IN "
+            "(SELECT study_id FROM series)")
+        self.connection.execute(
+            "DELETE FROM patients WHERE id NOT IN "
+            "(SELECT patient_id FROM studies)")
+
+# ============================== Query Methods ===============================
+
+    def get_patients(self):
+        """Return the indexed patients."""
+        return [dict(r) for r in self.connection.execute(
+            "SELECT * FROM patients ORDER BY id")]
+
+    def get_studies(self, patient_id=None):
+        """Return the indexed studies, optionally only for a patient."""
+        return self._select("studies", patient_id=patient_id)
+
+    def get_series(self, study_id=None, modality=None):
+        """Return the indexed series, optionally filtered by study/modality."""
+        return self._select("series", study_id=study_id, modality=modality)
+
+    def get_files(self, series_id=None, sop_class=None):
+        """Return the indexed DICOM files.
+
+        Parameters
+        ----------
+        series_id : str, optional
+            Only return files of the given Series Instance UID
+        sop_class : str, optional
+            Only return files of the SOP class as determined by
+            DicomParser.GetSOPClassUID, i.e. 'ct', 'rtss', 'rtdose', 'rtplan'
+
+        Returns
+        -------
+        list
+            Files ordered by image location (if present) and path
+        """
+        return self._select(
+            "files", "image_location, path", ["series_id IS NOT NULL"],
+            series_id=series_id, sop_class=sop_class)
+
+    def get_file(self, sop_instance_uid):
+        """Return the path of the file with the given SOP Instance UID."""
+        row = self.connection.execute(
+            "SELECT path FROM files WHERE sop_instance_uid = ?",
+            (sop_instance_uid,)).fetchone()
+        return row['path'] if row else None
+
+    def get_referencing_files(self, uid, reference_type=None):
+        """Return the paths of the files that reference the given UID.
+
+        Parameters
+        ----------
+        uid : str
+            Referenced SOP Instance or Series Instance UID
+        reference_type : str, optional
+            Type of reference: 'series', 'rtss' or 'rtplan'
+
+        Returns
+        -------
+        list
+            Paths of the referencing files
+        """
+        query = "SELECT DISTINCT path FROM refs WHERE uid = ?"
+        params = [uid]
+        if reference_type:
+            query += " AND type = ?"
+            params.append(reference_type)
+        return [r['path'] for r in self.connection.execute(
+            query + " ORDER BY path", params)]
+
+    def get_references(self, path):
+        """Return the UIDs referenced by an indexed file by reference type."""
+        return {r['type']: r['uid'] for r in self.connection.execute(
+            "SELECT type, uid FROM refs WHERE path = ?", (path,))}
+
+    def get_plan_files(self, rtplan):
+        """Return the files associated with an RT Plan.
+
+        Parameters
+        ----------
+        rtplan : str
+            SOP Instance UID of the RT Plan
+
+        Returns
+        -------
+        dict
+            Paths of the 'rtplan', the referenced structure set ('rtss'),
+            the image files referenced by the structure set ('images') and
+            the RT Doses that reference the plan ('rtdose').
+        """
+        files = {'rtplan': self.get_file(rtplan), 'rtss': None,
+                 'images': [], 'rtdose': []}
+        files['rtdose'] = [
+            p for p in self.get_referencing_files(rtplan, 'rtplan')
+            if self._sop_class(p) == 'rtdose']
+        if files['rtplan'] is None:
+            return files
+        rtss = self.get_references(files['rtplan']).get('rtss')
+        if rtss:
+            files['rtss'] = self.get_file(rtss)
+        if files['rtss']:
+            series = self.get_references(files['rtss']).get('series')
+            if series:
+                files['images'] = [
+                    f['path'] for f in self.get_files(series_id=series)]
+        return files
+
+    def _sop_class(self, path):
+        """Return the SOP class of an indexed file."""
+        row = self.connection.execute(
+            "SELECT sop_class FROM files WHERE path = ?", (path,)).fetchone()
+        return row['sop_class'] if row else None
+
+    def _select(self, table, order="id", conditions=None, **filters):
+        """Select the rows of a table matching all non-None filters."""
+        query = "SELECT * FROM %s" % table
+        conditions = list(conditions or [])
+        params = []
+        for column, value in filters.items():
+            if value is not None:
+                conditions.append("%s = ?" % column)
+                params.append(value)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return [dict(r) for r in self.connection.execute(
+            query + " ORDER BY " + order, params)]
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# series.py
+"""Routines to load the 3D image volume of a DICOM image series."""
+# Copyright (c) 2026 dicompyler-core contributors
+# This file is part of dicompyler-core, released under a BSD license.
+#    See the file license.txt included with this distribution, also
+#    available at https://github.com/dicompyler/dicompyler-core/
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dicompylercore import dicomparser
+from dicompylercore.config import pil_available
+
+if pil_available:
+    from PIL import Image
+
+logger = logging.getLogger('dicompylercore.series')
+
+
+class ImageSeries:
+    """Class that loads the 3D image volume of a DICOM image series."""
+
+    def __init__(self, files, dtype=np.float32, workers=None, cache=None):
+        """Initialize an ImageSeries from the image slice files of a series.
+
+        Parameters
+        ----------
+        files : list
+            DICOM image slice file locations in any order
+        dtype : numpy dtype, optional
+            Data type of the rescaled image volume, by default float32.
+            Integer data types (i.e. int16) require integer rescale slopes
+            and intercepts.
+        workers : int, optional
+            Number of threads used to read the slices, by default determined
+            by ThreadPoolExecutor
+        cache : str or Path, optional
+            Location of a .npy file the volume is memory mapped to. If the
+            cache exists and the slice files are unchanged, the volume is
+            loaded from the cache without reading the slice files.
+
+        Raises
+        ------
+        AttributeError
+            Raised if a file is not an image or an integer dtype can't hold
+            the rescaled pixel values
+        NotImplementedError
+            Raised if the slices don't share the same series and geometry
+        """
+        self.dtype = np.dtype(dtype)
+        self.workers = workers
+        stats = [_file_stat(f) for f in files]
+        if cache is not None and self._load_cache(cache, stats):
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parsers = list(executor.map(dicomparser.DicomParser, files))
+        self._load_headers(files, parsers)
+        self._load_volume(parsers, cache)
+        if cache is not None:
+            self._save_cache(cache, stats)
+
+    ####################################################
+    # Basic properties
+    ####################################################
+    @property
+    def shape(self):
+        """Get the slice, row, column dimensions of the volume"""
+        return self.volume.shape
+
+    @property
+    def slice_spacing(self):
+        """Get the median spacing between slices (in mm)"""
+        if len(self.locations) < 2:
+            return None
+        return float(np.median(np.diff(self.locations)))
+
+    ####################################################
+    # Volume loading
+    ####################################################
+    def _load_headers(self, files, parsers):
+        """Sort the slices by image location and verify their geometry."""
+        for f, dp in zip(files, parsers):
+            if "PixelData" not in dp.ds or \
+                    "ImagePositionPatient" not in dp.ds:
+                raise AttributeError("%s is not an image slice." % f)
+        locations = np.array([dp.GetImageLocation() for dp in parsers])
+        order = np.argsort(locations, kind='stable')
+        if len(np.unique(locations)) != len(locations):
+            raise NotImplementedError(
+                "Multiple slices with the same image location detected.")
+        parsers[:] = [parsers[i] for i in order]
+        self.files = [str(files[i]) for i in order]
+        self.locations = locations[order]
+
+        first = parsers[0].ds
+        for dp in parsers[1:]:
+            mismatches = [
+                attr for attr in ("SeriesInstanceUID", "Rows", "Columns")
+                if dp.ds.get(attr) != first.get(attr)]
+            mismatches += [
+                attr for attr in ("PixelSpacing", "ImageOrientationPatient")
+                if not np.allclose(dp.ds.get(attr), first.get(attr))]
+            if mismatches:
+                raise NotImplementedError(
+                    "Image slices with mismatched attributes are not "
+                    "supported: %s" % ",".join(mismatches))
+        self.series_instance_uid = first.get("SeriesInstanceUID")
+        self.position = [float(p) for p in first.ImagePositionPatient]
+        self.orientation = [float(o) for o in first.ImageOrientationPatient]
+        self.pixelspacing = [float(s) for s in first.PixelSpacing]
+
+    def _load_volume(self, parsers, cache=None):
+        """Read the slices into the volume and rescale it in one pass."""
+        rescale = np.array(
+            [dp.GetRescaleInterceptSlope() for dp in parsers], dtype=float)
+        intercepts, slopes = rescale[:, 0], rescale[:, 1]
+        integer = np.issubdtype(self.dtype, np.integer)
+        if integer and (np.any(np.mod(slopes, 1)) or
+                        np.any(np.mod(intercepts, 1))):
+            raise AttributeError(
+                "An integer dtype requires integer rescale slopes & "
+                "intercepts. Use a floating point dtype instead.")
+        first = parsers[0].ds
+        shape = (len(parsers), first.Rows, first.Columns)
+        if cache is not None:
+            self.volume = np.lib.format.open_memmap(
+                str(cache), mode='w+', dtype=self.dtype, shape=shape)
+        else:
+            self.volume = np.empty(shape, dtype=self.dtype)
+        extrema = np.zeros((len(parsers), 2))
+
+        def read_slice(i):
+            # Release each parser (and its decoded pixel data) once copied
+            dp, parsers[i] = parsers[i], None
+            pixel_array = dp.pixel_array
+            if integer:
+                extrema[i] = pixel_array.min(), pixel_array.max()
+            self.volume[i] = pixel_array
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(read_slice, range(len(extrema))))
+
+        if integer:
+            # Check if the stored & rescaled values fit in the integer dtype
+            rescaled = extrema * slopes[:, None] + intercepts[:, None]
+            info = np.iinfo(self.dtype)
+            if min(extrema.min(), rescaled.min()) < info.min or \
+                    max(extrema.max(), rescaled.max()) > info.max:
+                raise AttributeError(
+                    "The rescaled pixel values do not fit in %s. Use a "
+                    "larger dtype instead." % self.dtype)
+
+        # Apply the rescale slope & intercept to all slices at once
+        if np.any(slopes != 1):
+            self.volume *= slopes.astype(self.dtype)[:, None, None]
+        if np.any(intercepts != 0):
+            self.volume += intercepts.astype(self.dtype)[:, None, None]
+
+    ####################################################
+    # Rendering
+    ####################################################
+    def get_default_window_level(self):
+        """Determine the default window/level from the range of the volume."""
+        wmax = max(float(self.volume.max()), 0)
+        wmin = min(float(self.volume.min()), 0)
+        # Default window is the range of the volume
+        window = int(wmax - wmin)
+        # Default level is the range midpoint minus the window minimum
+        level = int(window / 2 - abs(wmin))
+        return window, level
+
+    def render(self, window=0, level=0, stride=1, out=None, chunk_size=16):
+        """Apply the window/level to the volume as an 8-bit image stack.
+
+        Parameters
+        ----------
+        window : float, optional
+            Image window, by default the range of the volume
+        level : float, optional
+            Image level, by default the midpoint of the volume range
+        stride : int, optional
+            Render every nth slice, by default every slice
+        out : ndarray or str, optional
+            uint8 array (i.e. a memmap) or .npy file location to render to
+        chunk_size : int, optional
+            Number of slices rendered at once, by default 16
+
+        Returns
+        -------
+        ndarray
+            uint8 (slice, row, column) array of the rendered slices
+        """
+        if (window == 0) and (level == 0):
+            window, level = self.get_default_window_level()
+        volume = self.volume[::stride]
+        if out is None:
+            out = np.empty(volume.shape, dtype=np.uint8)
+        elif not isinstance(out, np.ndarray):
+            out = np.lib.format.open_memmap(
+                str(out), mode='w+', dtype=np.uint8, shape=volume.shape)
+        # Integer volumes are rendered by indexing a precomputed LUT
+        lut = dicomparser.get_window_level_lut(
+            window, level, 1, 0, volume.dtype)
+        for start in range(0, len(volume), chunk_size):
+            chunk = volume[start:start + chunk_size]
+            if lut is not None:
+                out[start:start + chunk_size] = \
+                    lut[chunk.view('u%d' % chunk.dtype.itemsize)]
+            else:
+                # Use double precision like DicomParser.GetImage
+                out[start:start + chunk_size] = \
+                    dicomparser.apply_window_level(
+                        chunk.astype(np.float64), window, level)
+        return out
+
+    def export_images(self, directory, window=0, level=0, stride=1,
+                      size=None, workers=None, prefix='', format='png'):
+        """Render the volume and save each slice as an image file.
+
+        Parameters
+        ----------
+        directory : str or Path
+            Directory the image files are saved to
+        window : float, optional
+            Image window, by default the range of the volume
+        level : float, optional
+            Image level, by default the midpoint of the volume range
+        stride : int, optional
+            Export every nth slice, by default every slice
+        size : tuple, optional
+            Maximum image size tuple in pixels, by default the slice size
+        workers : int, optional
+            Number of threads used to encode the images, by default
+            determined by ThreadPoolExecutor
+        prefix : str, optional
+            File name prefix, followed by the slice index
+        format : str, optional
+            Image file format, by default 'png'
+
+        Returns
+        -------
+        list
+            Locations of the saved image files
+        """
+        if not pil_available:
+            raise ImportError(
+                "Pillow must be installed to export images.")
+        images = self.render(window, level, stride)
+        filenames = [
+            os.path.join(directory, '%s%04d.%s' % (prefix, i, format))
+            for i in range(0, len(self.volume), stride)]
+
+        def save_image(i):
+            im = Image.fromarray(images[i])
+            if size:
+                im.thumbnail(size, Image.LANCZOS)
+            im.save(filenames[i], format=format)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(save_image, range(len(filenames))))
+        return filenames
+
+    ####################################################
+    # Volume cache
+    ####################################################
+    def _save_cache(self, cache, stats):
+        """Save the series metadata alongside the memory mapped volume."""
+        self.volume.flush()
+        metadata = {
+            'files': self.files, 'stats': stats, 'dtype': self.dtype.str,
+            'locations': self.locations.tolist(),
+            'series_instance_uid': self.series_instance_uid,
+            'position': self.position, 'orientation': self.orientation,
+            'pixelspacing': self.pixelspacing}
+        with open(_metadata_path(cache), 'w') as f:
+            json.dump(metadata, f)
+
+    def _load_cache(self, cache, stats):
+        """Load the volume from the cache if the slice files are unchanged.
+
+        Returns
+        -------
+        bool
+            True if the volume was loaded from the cache
+        """
+        try:
+            with open(_metadata_path(cache)) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if metadata['dtype'] != self.dtype.str or \
+                sorted(map(tuple, metadata['stats'])) != \
+                sorted(map(tuple, stats)):
+            return False
+        try:
+            self.volume = np.load(str(cache), mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+        logger.debug('Loaded image series volume from cache %s', cache)
+        self.files = metadata['files']
+        self.locations = np.array(metadata['locations'])
+        self.series_instance_uid = metadata['series_instance_uid']
+        self.position = metadata['position']
+        self.orientation = metadata['orientation']
+        self.pixelspacing = metadata['pixelspacing']
+        return True
+
+
+def _file_stat(filename):
+    """Return the absolute path, mtime & size of a file."""
+    stat = os.stat(filename)
+    return [os.path.abspath(filename), stat.st_mtime, stat.st_size]
+
+
+def _metadata_path(cache):
+    """Return the location of the metadata file of a volume cache."""
+    return str(cache) + '.json'
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# structure.py
+"""Array-backed contour geometry of DICOM RT Structure Set ROIs."""
+# Copyright (c) 2026 dicompyler-core contributors
+# This file is part of dicompyler-core, released under a BSD license.
+#    See the file license.txt included with this distribution, also
+#    available at https://github.com/dicompyler/dicompyler-core/
+
+from collections.abc import Mapping
+import warnings
+import numpy as np
+
+
+class StructureGeometry(Mapping):
+    """Class that stores the contours of a structure in contiguous arrays.
+
+    The points of all contours are stored in a single (N, 3) array, and the
+    contours are delimited by offsets into it. The planes of the structure
+    are accessed as a mapping of the slice position (z) in mm to a list of
+    (n, 3) point arrays, one for each contour on the plane.
+    """
+
+    def __init__(self, points=None, offsets=None, types=None):
+        """Initialize a StructureGeometry from contour point arrays.
+
+        Parameters
+        ----------
+        points : array_like, optional
+            (N, 3) array of the xyz points of all contours
+        offsets : array_like, optional
+            Start index of each contour within points, followed by N
+        types : list, optional
+            Contour Geometric Type of each contour, i.e. 'CLOSED_PLANAR'
+        """
+        self.points = np.zeros((0, 3)) if points is None else \
+            np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 3)
+        self.offsets = np.zeros(1, dtype=np.intp) if offsets is None else \
+            np.asarray(offsets, dtype=np.intp)
+        self.types = [] if types is None else list(types)
+
+        starts = self.offsets[:-1]
+        # The slice position of each contour is that of its first point
+        self.z = np.array(
+            [round(z, 2) for z in self.points[starts, 2].tolist()])
+        # Bounding box of each contour: [xmin, ymin, xmax, ymax]
+        if len(starts):
+            self.bounds = np.hstack((
+                np.minimum.reduceat(self.points[:, 0:2], starts),
+                np.maximum.reduceat(self.points[:, 0:2], starts)))
+        else:
+            self.bounds = np.zeros((0, 4))
+        # Contour indices of each plane in order of their first appearance
+        self.planes = {}
+        for i, z in enumerate(self.z.tolist()):
+            self.planes.setdefault(z, []).append(i)
+
+    @classmethod
+    def from_contours(cls, contours):
+        """Create a StructureGeometry from a sequence of contours.
+
+        Parameters
+        ----------
+        contours : iterable
+            (type, points) tuple for each contour, where points is a flat
+            or (n, 3) sequence of xyz coordinates. Empty contours are skipped.
+
+        Returns
+        -------
+        StructureGeometry
+            Contour geometry of the structure
+        """
+        types, arrays = [], []
+        for contour_type, points in contours:
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+            if len(points):
+                types.append(contour_type)
+                arrays.append(points)
+        offsets = np.zeros(len(arrays) + 1, dtype=np.intp)
+        offsets[1:] = np.cumsum([len(a) for a in arrays])
+        points = np.concatenate(arrays) if arrays else None
+        return cls(points, offsets, types)
+
+    @classmethod
+    def from_dict(cls, planes):
+        """Create a StructureGeometry from DicomParser.GetStructureCoordinates.
+
+        Parameters
+        ----------
+        planes : dict
+            Structure coordinates from DicomParser.GetStructureCoordinates
+
+        Returns
+        -------
+        StructureGeometry
+            Contour geometry of the structure
+        """
+        if isinstance(planes, StructureGeometry):
+            return planes
+        return cls.from_contours(
+            (c['type'], c['data']) for plane in planes.values()
+            for c in plane)
+
+    def to_dict(self):
+        """Return the planes in the format of GetStructureCoordinates.
+
+        Returns
+        -------
+        dict
+            Dict of lists of contours keyed by the string slice position,
+            with the 'type', 'num_points' and the xyz point list ('data')
+            of each contour
+        """
+        num_points = self.num_points.tolist()
+        return {
+            str(z) + '0': [
+                {'type': self.types[i],
+                 'num_points': num_points[i],
+                 'data': self.contour(i).tolist()} for i in indices]
+            for z, indices in self.planes.items()}
+
+    @property
+    def num_points(self):
+        """Get the number of points of each contour"""
+        return np.diff(self.offsets)
+
+    def contour(self, index):
+        """Return the (n, 3) point array of a contour."""
+        return self.points[self.offsets[index]:self.offsets[index + 1]]
+
+    def extents(self):
+        """Return the in-plane structure extents in patient coordinates.
+
+        Returns
+        -------
+        list
+            Structure extents in patient coordinates: [xmin, ymin, xmax, ymax]
+        """
+        return np.concatenate((
+            np.amin(self.bounds[:, 0:2], axis=0),
+            np.amax(self.bounds[:, 2:4], axis=0))).tolist()
+
+    def areas(self):
+        """Return the area of each contour using the shoelace formula.
+
+        Returns
+        -------
+        ndarray
+            Area of each contour in mm^2
+        """
+        if not len(self.types):
+            return np.zeros(0)
+        starts = self.offsets[:-1]
+        # Index of the next point of each point, wrapping around each contour
+        following = np.arange(1, len(self.points) + 1)
+        following[self.offsets[1:] - 1] = starts
+        x, y = self.points[:, 0], self.points[:, 1]
+        cross = x * y[following] - x[following] * y
+        return np.abs(np.add.reduceat(cross, starts)) / 2
+
+    def nesting_depths(self):
+        """Return the number of contours enclosing each contour in its plane.
+
+        The first point of each contour is tested against the other contours
+        of the plane whose bounding boxes contain it. Contours with an odd
+        depth are holes.
+
+        Returns
+        -------
+        ndarray
+            Nesting depth of each contour
+        """
+        depths = np.zeros(len(self.types), dtype=np.intp)
+        first_points = self.points[self.offsets[:-1], 0:2]
+        for indices in self.planes.values():
+            if len(indices) < 2:
+                continue
+            indices = np.array(indices)
+            px, py = first_points[indices].T
+            bounds = self.bounds[indices]
+            # Candidate contours whose bounding box contains the point
+            px, py = px[:, None], py[:, None]
+            candidates = (px >= bounds[:, 0]) & (px <= bounds[:, 2]) & \
+                (py >= bounds[:, 1]) & (py <= bounds[:, 3])
+            np.fill_diagonal(candidates, False)
+            for j in np.flatnonzero(candidates.any(axis=0)):
+                inside = candidates[:, j]
+                depths[indices[inside]] += point_in_polygon(
+                    px[inside, 0], py[inside, 0], self.contour(indices[j]))
+        return depths
+
+    def volume(self, thickness):
+        """Calculate the volume of the structure from its contour areas.
+
+        Holes (contours with an odd nesting depth) are subtracted and the
+        first and last planes contribute half of their area. Only planes with
+        CLOSED_PLANAR contours are included.
+
+        Parameters
+        ----------
+        thickness : float
+            Thickness of the structure in mm
+
+        Returns
+        -------
+        float
+            Volume of structure in cm3
+        """
+        if not len(self.planes):
+            return 0
+        areas = self.areas()
+        signs = np.where(self.nesting_depths() % 2, -1, 1)
+        # The planes are ordered by the keys of GetStructureCoordinates
+        order = sorted(self.planes, key=lambda z: str(z) + '0')
+        s = 0
+        for i, z in enumerate(order):
+            indices = self.planes[z]
+            # Skip contour data if it is not CLOSED_PLANAR
+            if self.types[indices[0]] != 'CLOSED_PLANAR':
+                continue
+            plane_areas = areas[indices]
+            if (i == 0 or i == len(order) - 1) and len(order) > 1:
+                plane_areas = plane_areas // 2
+            s += np.dot(signs[indices], plane_areas)
+        return float(s) * thickness / 1000
+
+    def __getitem__(self, z):
+        # Accept the string slice positions of GetStructureCoordinates
+        try:
+            indices = self.planes[float(z)]
+        except (TypeError, ValueError):
+            raise KeyError(z)
+        return [self.contour(i) for i in indices]
+
+    def __iter__(self):
+        return iter(self.planes)
+
+    def __len__(self):
+        return len(self.planes)
+
+    def __repr__(self):
+        return "StructureGeometry(%d planes, %d contours, %d points)" % (
+            len(self.planes), len(self.types), len(self.points))
+
+
+def point_in_polygon(x, y, polygon):
+    """Determine whether the points are inside a polygon (even-odd rule).
+
+    Parameters
+    ----------
+    x, y : ndarray
+        Coordinates of the points to test
+    polygon : ndarray
+        (n, 2) or (n, 3) array of the polygon vertices
+
+    Returns
+    -------
+    ndarray
+        Boolean array that is True for the points inside the polygon
+    """
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    y = np.asarray(y)[:, None]
+    # Edges that span the horizontal ray cast from each point
+    spans = (y0 > y) != (y1 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    crosses = spans & (np.asarray(x)[:, None] < crossing)
+    return (np.count_nonzero(crosses, axis=1) % 2).astype(np.bool_)
+
+
+def parse_contour_data(value):
+    """Parse the raw value of a ContourData element into an (n, 3) array.
+
+    The backslash delimited decimal strings are parsed by NumPy directly,
+    without creating a Python object for each value.
+
+    Parameters
+    ----------
+    value : bytes
+        Raw (undecoded) value of a ContourData (3006,0050) element
+
+    Returns
+    -------
+    ndarray
+        (n, 3) float64 array of the xyz points of the contour
+
+    Raises
+    ------
+    ValueError
+        Raised if the value is not a list of decimal strings
+    """
+    value = value.strip(b' \x00')
+    if not value:
+        return np.zeros((0, 3))
+    with warnings.catch_warnings():
+        # NumPy stops parsing at malformed values with a DeprecationWarning
+        warnings.simplefilter('ignore', DeprecationWarning)
+        points = np.fromstring(value, sep='\\')
+    if (points.size != value.count(b'\\') + 1) or (points.size % 3):
+        raise ValueError("ContourData is not a list of xyz decimal strings.")
+    return points.reshape(-1, 3)
@@ -39,7 +39,6 @@ setup(
     extras_require={
         'image': ["pillow>=1.0"],
         'dvhinterpolation': ["scikit-image"],
-        'volume': ["shapely>=1.6"],
         'doseinterpolation': ["scipy"]
     },
     license="BSD License",
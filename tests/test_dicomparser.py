@@ -7,15 +7,18 @@
 
 import unittest
 import os
+import tempfile
 from dicompylercore import dicomparser
-from dicompylercore.config import pil_available, shapely_available
+from dicompylercore.config import pil_available
 try:
+    from pydicom import dcmread
+    from pydicom.encaps import encapsulate
     from pydicom.multival import MultiValue as mv
     from pydicom.valuerep import DSfloat
 except ImportError:
     from dicom.multival import MultiValue as mv
     from dicom.valuerep import DSfloat
-from numpy import array, arange
+from numpy import array, arange, isnan
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 
 basedata_dir = "tests/testdata"
@@ -124,6 +127,17 @@ class TestImage(unittest.TestCase):
         }
         self.assertEqual(self.dp.GetImageData(), data)
 
+    def test_lazy_pixel_array(self):
+        """Test if the pixel array is only decoded when accessed."""
+        self.dp.GetSeriesInfo()
+        self.dp.GetImageData()
+        self.assertIsNone(self.dp._pixel_array)
+        self.assertEqual(self.dp.pixel_array.shape, (512, 512))
+        self.assertIs(self.dp.pixel_array, self.dp.pixel_array)
+        # Datasets without pixel data don't have a pixel array
+        rtss = dicomparser.DicomParser(os.path.join(example_data, "rtss.dcm"))
+        self.assertFalse(hasattr(rtss, 'pixel_array'))
+
     def test_image_location(self):
         """Test if the image location can be parsed."""
         loc = 168.55929999999998
@@ -140,6 +154,47 @@ class TestImage(unittest.TestCase):
         image = 90
         self.assertEqual(self.dp.GetImage().getpixel((255, 254)), image)
 
+    def test_default_window_level(self):
+        """Test if the default window/level is determined from the image."""
+        self.assertEqual(self.dp.GetDefaultImageWindowLevel(), (400, 20))
+        del self.dp.ds.WindowWidth
+        self.assertEqual(self.dp.GetDefaultImageWindowLevel(), (2457, 228))
+        # The range is determined from the rescaled values
+        self.dp.ds.RescaleSlope = -1
+        self.dp.ds.RescaleIntercept = 100
+        self.assertEqual(self.dp.GetDefaultImageWindowLevel(), (2457, -128))
+        self.assertEqual(self.dp.GetDefaultImageWindowLevel(), (2457, -128))
+        # The cached value is invalidated if the pixel array changes
+        self.dp.pixel_array = self.dp.pixel_array * 2
+        self.assertEqual(self.dp.GetDefaultImageWindowLevel(), (4914, -357))
+
+    def test_default_window_level_frame(self):
+        """Test if the default window/level is determined per frame."""
+        dp = dicomparser.DicomParser(os.path.join(example_data, "rtdose.dcm"))
+        self.assertEqual(dp.GetDefaultImageWindowLevel(), (1048626, 524313))
+        frame = dp.pixel_array[50]
+        window = int(frame.max())
+        self.assertEqual(
+            dp.GetDefaultImageWindowLevel(frame=50),
+            (window, int(window / 2)))
+
+    def test_window_level_lut(self):
+        """Test if the window/level LUT matches the rescaled calculation."""
+        intercept, slope = self.dp.GetRescaleInterceptSlope()
+        pixel_array = self.dp.pixel_array
+        for window, level in ((400, 40), (2000, -500), (1, 0)):
+            lut = dicomparser.get_window_level_lut(
+                window, level, slope, intercept, pixel_array.dtype)
+            assert_array_equal(
+                lut[pixel_array.view('u2')],
+                self.dp.GetLUTValue(
+                    pixel_array * slope + intercept, window, level))
+        # The LUT is cached & only used for integer pixel data
+        self.assertIs(lut, dicomparser.get_window_level_lut(
+            1, 0, slope, intercept, pixel_array.dtype))
+        self.assertIsNone(dicomparser.get_window_level_lut(
+            1, 0, slope, intercept, 'float32'))
+
     def test_patient_to_pixel_lut(self):
         """Test if the image transformation matrix (LUT) can be generated."""
         lutvalue = 273.925909
@@ -210,7 +265,6 @@ class TestRTStructureSet(unittest.TestCase):
         self.assertAlmostEqual(
             self.dp.CalculatePlaneThickness(planes), thickness)
 
-    @unittest.skipUnless(shapely_available, "shapely not installed")
     def test_structure_volume(self):
         """Test if a structure volume can be calculated."""
         coords = self.dp.GetStructureCoordinates(5)
@@ -218,13 +272,25 @@ class TestRTStructureSet(unittest.TestCase):
         self.assertAlmostEqual(
             self.dp.CalculateStructureVolume(coords, 3), volume)
 
-    @unittest.skipUnless(shapely_available, "shapely not installed")
     def test_structure_volume_holes(self):
         """Test if a structure volume with holes can be calculated."""
         coords = self.dp.GetStructureCoordinates(6)
         volume = 1995.1847937
         self.assertAlmostEqual(
             self.dp.CalculateStructureVolume(coords, 3), volume)
+        self.assertAlmostEqual(
+            self.dp.CalculateStructureVolume(
+                self.dp.GetStructureGeometry(6), 3), volume)
+
+    def test_structure_volumes(self):
+        """Test if the volumes of all structures can be calculated."""
+        volumes = self.dp.CalculateStructureVolumes(thickness=3)
+        self.assertEqual(sorted(volumes), list(range(1, 11)))
+        self.assertAlmostEqual(volumes[5], 432.84104445)
+        self.assertAlmostEqual(volumes[6], 1995.1847937)
+        self.assertEqual(volumes[2], 0)
+        volumes = self.dp.CalculateStructureVolumes([5])
+        self.assertAlmostEqual(volumes[5], 432.84104445)
 
 
 class TestRTPlan(unittest.TestCase):
@@ -307,6 +373,48 @@ class TestRTDose(unittest.TestCase):
         # Test for plane that doesn't exist in the dose grid
         assert_array_equal(self.dp.GetDoseGrid(-10000), array([]))
 
+    def test_dose_data_cache(self):
+        """Test if the dose data metadata is memoized per parser."""
+        dosedata = self.dp.GetDoseData()
+        self.assertIs(self.dp.GetDoseData()['lut'][0], dosedata['lut'][0])
+        self.assertIsNot(self.dp.GetDoseData(), dosedata)
+        # Replacing the pixel data invalidates the cached dose max
+        self.dp.pixel_array = self.dp.pixel_array * 2
+        self.assertEqual(
+            self.dp.GetDoseData()['dosemax'], dosedata['dosemax'] * 2)
+        # The chunked memmap dose max is identical to the in-memory one
+        dp = dicomparser.DicomParser(
+            os.path.join(example_data, "rtdose.dcm"),
+            memmap_pixel_array=True)
+        self.assertEqual(
+            dp.GetDoseMax(chunk_size=1), dosedata['dosemax'])
+
+    def test_dose_frame_indices(self):
+        """Test if the dose frames can be determined for a slice position."""
+        # Test for plane that is listed in the GFOV
+        self.assertEqual(self.dp.GetDoseFrameIndices(-122.4407), (0, 0, 1.0))
+        # Test for plane that is between two planes of the GFOV
+        ub, lb, fz = self.dp.GetDoseFrameIndices(-120.4407)
+        self.assertEqual((ub, lb), (1, 0))
+        self.assertAlmostEqual(fz, 2 / 3)
+        # Test for plane that doesn't exist in the dose grid
+        self.assertIsNone(self.dp.GetDoseFrameIndices(-10000))
+        # Test if the index is rebuilt if the dose grid position changes
+        self.dp.ds.ImagePositionPatient[2] = -100
+        self.assertEqual(self.dp.GetDoseFrameIndices(-100), (0, 0, 1.0))
+
+    def test_dose_planes(self):
+        """Test if multiple dose planes can be gathered at once."""
+        z = [-122.4407, -120.4407, -10000, -110.9407]
+        planes = self.dp.GetDosePlanes(z)
+        self.assertEqual(planes.shape, (4, 129, 194))
+        for plane, position in zip(planes, z):
+            grid = self.dp.GetDoseGrid(position)
+            if grid.size:
+                assert_array_equal(plane, grid)
+            else:
+                self.assertTrue(isnan(plane).all())
+
     def test_isodose_points(self):
         """Test if isodose points can be generated from the dose grid."""
         points = [(106, 20), (108, 20), (110, 20)]
@@ -320,6 +428,36 @@ class TestRTDose(unittest.TestCase):
             memmap_pixel_array=True)
         self.assertEqual(dp.GetIsodosePoints()[0:3], points)
 
+    def test_pixel_array_memmap(self):
+        """Test if the memmapped pixel data is located for any VR encoding."""
+        rtdose_dcm = os.path.join(example_data, "rtdose.dcm")
+        pixel_array = self.dp.pixel_array
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "rtdose.dcm")
+            for syntax, little_endian in (('1.2.840.10008.1.2.1', True),
+                                          ('1.2.840.10008.1.2.2', False)):
+                ds = dcmread(rtdose_dcm)
+                ds.file_meta.TransferSyntaxUID = syntax
+                ds.is_implicit_VR = False
+                ds.is_little_endian = little_endian
+                if not little_endian:
+                    ds.PixelData = ds.pixel_array.byteswap().tobytes()
+                ds.save_as(filename)
+                dp = dicomparser.DicomParser(
+                    filename, memmap_pixel_array=True)
+                assert_array_equal(dp.pixel_array, pixel_array)
+                # The memory map is only opened once
+                self.assertIs(dp.GetPixelArray(), dp.GetPixelArray())
+                del dp
+            # Encapsulated pixel data cannot be memory mapped
+            ds = dcmread(rtdose_dcm)
+            ds.file_meta.TransferSyntaxUID = '1.2.840.10008.1.2.5'
+            ds.is_implicit_VR = False
+            ds.PixelData = encapsulate([ds.PixelData])
+            ds.save_as(filename)
+            with self.assertRaises(NotImplementedError):
+                dicomparser.DicomParser(filename, memmap_pixel_array=True)
+
     def test_dose_data(self):
         """Test if the dose data can be parsed."""
         data = {
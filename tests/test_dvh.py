@@ -7,9 +7,13 @@
 
 import unittest
 import os
+import pickle
+import shutil
+import tempfile
 from dicompylercore import dvh, dicomparser
-from numpy import array, arange
-from numpy.testing import assert_array_equal
+from numpy import (array, arange, float32, float64, median, memmap,
+                   shares_memory)
+from numpy.testing import assert_array_equal, assert_array_almost_equal
 
 mpl_available = True
 try:
@@ -138,6 +142,27 @@ class TestDVH(unittest.TestCase):
         self.assertEqual(self.dvh.mean, 14.285830178442307)
         self.assertEqual(self.dvh.volume, 12.809180549338803)
 
+    def test_dvh_memoization(self):
+        """Test if the derived DVHs and statistics are memoized."""
+        subject = dvh.DVH.from_data([0, 5, 5, 10], 1).cumulative
+        self.assertIs(subject.differential, subject.differential)
+        self.assertIs(subject.relative_volume, subject.relative_volume)
+        self.assertIs(subject.relative_dose(10), subject.relative_dose(10))
+        self.assertIsNot(subject.relative_dose(10), subject.relative_dose(5))
+        self.assertIs(subject.D50, subject.statistic('D50'))
+        self.assertEqual(subject.max, 10)
+        # Assigning an attribute clears the memoized values
+        differential = subject.differential
+        subject.bins = subject.bins * 2
+        self.assertIsNot(subject.differential, differential)
+        self.assertEqual(subject.max, 20)
+        self.assertEqual(subject.differential.bins[-1], 20)
+        # Memoized values are not pickled
+        unpickled = pickle.loads(pickle.dumps(subject))
+        self.assertNotIn('_cache', unpickled.__dict__)
+        self.assertEqual(unpickled, subject)
+        self.assertEqual(unpickled.max, 20)
+
     def test_dvh_value(self):
         """Test if the DVHValue class works as expected."""
         self.assertEqual(str(dvh.DVHValue(100)), '100.00')
@@ -169,14 +194,57 @@ class TestDVH(unittest.TestCase):
             dvh.DVHValue(14.059999999999745, 'Gy'))
         self.assertEqual(
             self.dvh.dose_constraint(90),
-            dvh.DVHValue(14.169999999999742, 'Gy'))
+            dvh.DVHValue(14.165598761363459, 'Gy'))
         self.assertEqual(
             self.dvh.dose_constraint(0.02, 'cc'),
-            dvh.DVHValue(14.529999999999735, 'Gy'))
+            dvh.DVHValue(14.53498343793564, 'Gy'))
         self.assertEqual(
             self.dvh.dose_constraint(15, 'cc'),
             dvh.DVHValue(0.0, 'Gy'))
 
+    def test_dvh_statistics_nearest_bin(self):
+        """Test if the DVH statistics can use the nearest dose bin."""
+        subject = dvh.DVH(self.dvh.counts, self.dvh.bins, rx_dose=14)
+        self.assertEqual(
+            subject.dose_constraint(90, interpolate=False),
+            dvh.DVHValue(14.169999999999742, 'Gy'))
+        self.assertEqual(
+            subject.statistic('D90', interpolate=False),
+            dvh.DVHValue(14.169999999999742, 'Gy'))
+        self.assertEqual(
+            subject.dose_constraint(100, interpolate=False),
+            dvh.DVHValue(14.059999999999745, 'Gy'))
+        self.assertEqual(
+            subject.volume_constraint(14, 'Gy', interpolate=False),
+            dvh.DVHValue(12.809180549338601, 'cm3'))
+        # The module setting determines the default
+        dvh.interpolate_constraints = False
+        try:
+            self.assertEqual(
+                dvh.DVH(self.dvh.counts, self.dvh.bins).D90,
+                dvh.DVHValue(14.169999999999742, 'Gy'))
+        finally:
+            dvh.interpolate_constraints = True
+
+    def test_dvh_statistics_interpolation(self):
+        """Test if the DVH statistics are interpolated between dose bins."""
+        subject = dvh.DVH([100, 100, 80, 40, 20], [0, 1, 2, 3, 4, 5],
+                          volume_units='%', rx_dose=5)
+        self.assertEqual(subject.volume_constraint(1.5, 'Gy'),
+                         dvh.DVHValue(90, '%'))
+        self.assertEqual(subject.volume_constraint(4.5, 'Gy'),
+                         dvh.DVHValue(10, '%'))
+        self.assertEqual(subject.volume_constraint(6, 'Gy'),
+                         dvh.DVHValue(0, '%'))
+        self.assertEqual(subject.V50, dvh.DVHValue(60, '%'))
+        # The maximum dose that receives 100% is at the end of the plateau
+        self.assertEqual(subject.D100, dvh.DVHValue(1, 'Gy'))
+        self.assertEqual(subject.D90, dvh.DVHValue(1.5, 'Gy'))
+        self.assertEqual(subject.D30, dvh.DVHValue(3.5, 'Gy'))
+        self.assertEqual(subject.D10, dvh.DVHValue(4.5, 'Gy'))
+        self.assertEqual(subject.D0, dvh.DVHValue(5, 'Gy'))
+        self.assertEqual(subject.D101, dvh.DVHValue(0, 'Gy'))
+
     def test_dvh_statistics_shorthand(self):
         """Test if the DVH statistics can be accessed via shorthand."""
         self.assertEqual(
@@ -184,15 +252,38 @@ class TestDVH(unittest.TestCase):
         self.assertEqual(
             self.dvh.v14Gy, dvh.DVHValue(12.809180549338601, 'cm3'))
         self.assertEqual(
-            self.dvh.D90, dvh.DVHValue(14.169999999999742, 'Gy'))
+            self.dvh.D90, dvh.DVHValue(14.165598761363459, 'Gy'))
         self.assertEqual(
-            self.dvh.d2cc, dvh.DVHValue(14.389999999999738, 'Gy'))
+            self.dvh.d2cc, dvh.DVHValue(14.38928726513579, 'Gy'))
 
     def test_dvh_statistics_shorthand_fail(self):
         """Test if the DVH statistics shorthand fail on invalid syntaxes."""
         with self.assertRaises(AttributeError):
             self.dvh.v100agy
 
+    def test_dvh_statistics_batch(self):
+        """Test if multiple DVH statistics can be calculated at once."""
+        subject = dvh.DVH(self.dvh.counts, self.dvh.bins, rx_dose=14)
+        names = ['D100', 'D90', 'D2cc', 'd0.02cc', 'V100', 'v105', 'V14Gy',
+                 'D15cc', 'V100Gy', 'D90']
+        stats = subject.statistics(names)
+        self.assertEqual(list(stats), names[:-1])
+        for name in names:
+            self.assertEqual(
+                stats[name],
+                dvh.DVH(self.dvh.counts, self.dvh.bins,
+                        rx_dose=14).statistic(name))
+        self.assertIs(stats['D90'], subject.D90)
+        with self.assertRaises(AttributeError):
+            subject.statistics(['D90', 'v100agy'])
+        # Lookups in non-monotonic (differential) counts
+        diff = self.dvh.differential
+        for volume in (0, 0.01, 0.1, 0.3):
+            index = abs(diff.counts - volume).argmin()
+            self.assertEqual(
+                diff.dose_constraint(volume, 'cc', interpolate=False),
+                dvh.DVHValue(diff.bins[index], 'Gy'))
+
     def test_dvh_describe(self):
         """Test if the DVH statistics summary can be generated."""
         self.assertEqual(self.dvh.describe(), None)
@@ -236,6 +327,133 @@ class TestDVH(unittest.TestCase):
         subject.dose_constraint(1)
 
 
+class TestDVHCollection(unittest.TestCase):
+    """Unit tests for the DVHCollection class."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the DVHs of the example RT Dose for testing."""
+        rtdose = dicomparser.DicomParser(
+            os.path.join(example_data, "rtdose.dcm"))
+        cls.dvhs = [dvh.DVH.from_dicom_dvh(rtdose.ds, n, rx_dose=14)
+                    for n in (9, 7, 3)]
+        cls.collection = dvh.DVHCollection(
+            cls.dvhs, patients=['a', 'b', 'b'])
+
+    def test_collection(self):
+        """Test if the DVHs are resampled onto shared dose bins."""
+        c = self.collection
+        self.assertEqual(len(c), 3)
+        self.assertEqual(c.counts.dtype, float32)
+        self.assertEqual(c.counts.shape, (3, c.bins.size - 1))
+        self.assertAlmostEqual(c.bins[1], 0.01)
+        # DVHs with the shared bins are stored as is
+        assert_array_almost_equal(
+            c.counts[0], self.dvhs[0].cumulative.counts, decimal=3)
+        self.assertEqual(c[0].volume_units, 'cm3')
+        self.assertEqual(c[0].rx_dose, 14)
+        self.assertEqual([d.dose_units for d in c], ['Gy'] * 3)
+        with self.assertRaises(AttributeError):
+            dvh.DVHCollection(
+                [self.dvhs[0], self.dvhs[1].relative_volume])
+
+    def test_collection_filter(self):
+        """Test if the DVHs can be filtered without copying the counts."""
+        c = self.collection.filter(patient='b')
+        self.assertEqual(len(c), 2)
+        self.assertTrue(shares_memory(c._counts, self.collection._counts))
+        assert_array_equal(c.counts, self.collection.counts[1:])
+        assert_array_equal(c[1].counts, self.collection[2].counts)
+        self.assertEqual(len(c.filter(patient=['a'])), 0)
+        self.assertEqual(len(self.collection.filter(name=[None])), 3)
+
+    def test_collection_population(self):
+        """Test if the population curves are calculated across the DVHs."""
+        c = self.collection
+        counts = c.counts.astype(float64)
+        assert_array_almost_equal(c.mean().counts, counts.mean(axis=0))
+        assert_array_almost_equal(c.median().counts, median(counts, axis=0))
+        low, high = c.percentile((0, 100))
+        assert_array_almost_equal(low.counts, counts.min(axis=0))
+        assert_array_almost_equal(high.counts, counts.max(axis=0))
+        self.assertEqual(c.percentile(50).name, 'P50')
+
+    def test_collection_statistics(self):
+        """Test if the statistics equal those of the individual DVHs."""
+        names = ['D100', 'D90', 'D2cc', 'D0.02cc', 'V100', 'V50', 'V10Gy',
+                 'D5000cc', 'V100Gy']
+        for interpolate in (True, False):
+            stats = self.collection.statistics(names, interpolate)
+            for i, d in enumerate(self.collection):
+                expected = d.statistics(names, interpolate)
+                for name in names:
+                    self.assertAlmostEqual(
+                        stats[name][i], expected[name].value)
+        c = dvh.DVHCollection([dvh.DVH([1], [0, 1])])
+        with self.assertRaises(AttributeError):
+            c.statistics(['V100'])
+
+
+class TestDVHStorage(unittest.TestCase):
+    """Unit tests for the binary DVH format."""
+
+    def setUp(self):
+        """Setup the DVHs of the example RT Dose for testing."""
+        rtdose = dicomparser.DicomParser(
+            os.path.join(example_data, "rtdose.dcm"))
+        self.dvhs = [dvh.DVH.from_dicom_dvh(rtdose.ds, n, rx_dose=14,
+                                            name='ROI %d' % n)
+                     for n in rtdose.GetDVHs()]
+        self.dvhs.append(dvh.DVH(
+            [3, 2, 1], [0, 1, 5, 6], dvh_type='differential',
+            dose_units='%', volume_units='%', color=array([255, 0, 0]),
+            notes='Non-uniform bins'))
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.tmpdir)
+
+    def assertDVHEqual(self, first, second):
+        """Assert that the DVHs and all of their attributes are equal."""
+        self.assertEqual(first, second)
+        for attribute in ('rx_dose', 'name', 'notes'):
+            self.assertEqual(
+                getattr(first, attribute), getattr(second, attribute))
+        assert_array_equal(first.color, second.color)
+        assert_array_almost_equal(first.bins, second.bins, decimal=9)
+
+    def test_bytes(self):
+        """Test if a DVH can be serialized in the binary DVH format."""
+        for subject in self.dvhs:
+            data = subject.to_bytes()
+            self.assertDVHEqual(dvh.DVH.from_bytes(data), subject)
+        # Uniform bins are stored as their start & width
+        subject = self.dvhs[0]
+        self.assertLess(len(subject.to_bytes()), subject.counts.size * 4.5)
+        with self.assertRaises(ValueError):
+            dvh.DVH.from_bytes(pickle.dumps(subject))
+        with self.assertRaises(ValueError):
+            dvh.DVH.from_bytes(subject.to_bytes()[:-8])
+
+    def test_save_load(self):
+        """Test if DVHs can be saved to and memory mapped from a file."""
+        filename = os.path.join(self.tmpdir, "dvhs.dvh")
+        dvh.save_dvhs(filename, self.dvhs)
+        store = dvh.load_dvhs(filename)
+        self.assertEqual(len(store), len(self.dvhs))
+        self.assertIsInstance(store.counts, memmap)
+        self.assertEqual(store.counts.dtype, float32)
+        for loaded, subject in zip(store, self.dvhs):
+            self.assertDVHEqual(loaded, subject)
+        self.assertDVHEqual(store[-1], self.dvhs[-1])
+        with self.assertRaises(IndexError):
+            store[len(self.dvhs)]
+        del store
+        dvh.save_dvhs(filename, [])
+        self.assertEqual(len(dvh.load_dvhs(filename)), 0)
+
+
 if __name__ == '__main__':
     import sys
     sys.exit(unittest.main())
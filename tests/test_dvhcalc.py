@@ -16,8 +16,10 @@ try:
 except ImportError:
     from dicom.dataset import Dataset
     from dicom.sequence import Sequence
-from numpy import arange
-from numpy.testing import assert_allclose
+from matplotlib.path import Path
+from numpy import arange, histogram, random, trim_zeros, uint32
+import numpy.ma as ma
+from numpy.testing import assert_allclose, assert_array_equal
 from .util import fake_rtdose, fake_ss
 
 
@@ -99,6 +101,107 @@ class TestDVHCalc(unittest.TestCase):
         # Mean dose to structure
         self.assertAlmostEqual(dvh.mean, 0.6475329)
 
+    def test_dvh_calculation_multiple_rois(self):
+        """Test if DVHs for multiple ROIs can be calculated in one pass."""
+        dvhs = dvhcalc.get_dvhs(self.rtss.ds, self.rtdose.ds, [5, 8])
+        self.assertEqual(list(dvhs.keys()), [5, 8])
+        for key, dvh in dvhs.items():
+            self.assertEqual(dvh, self.calc_dvh(key))
+            self.assertEqual(dvh.name, self.calc_dvh(key).name)
+
+        # All structures are calculated if no ROIs are provided
+        dvhs = dvhcalc.get_dvhs(self.rtss.ds, self.rtdose.ds)
+        self.assertEqual(
+            sorted(dvhs.keys()), sorted(self.rtss.GetStructures().keys()))
+        self.assertAlmostEqual(dvhs[5].volume, 440.23124999)
+
+    def test_dvh_calculation_multiple_rois_parallel(self):
+        """Test if DVHs calculated in parallel are identical to serial."""
+        dvhs = dvhcalc.get_dvhs(self.rtss.ds, self.rtdose.ds, [8, 5])
+        parallel_dvhs = dvhcalc.get_dvhs(
+            self.rtss.ds, self.rtdose.ds, [8, 5], workers=2)
+        self.assertEqual(list(parallel_dvhs.keys()), [8, 5])
+        for key, dvh in dvhs.items():
+            assert_array_equal(parallel_dvhs[key].counts, dvh.counts)
+            assert_array_equal(parallel_dvhs[key].bins, dvh.bins)
+
+        # Memory mapped RT Dose is shared with the workers via the file
+        memmap_dvhs = dvhcalc.get_dvhs(
+            os.path.join(example_data, "rtss.dcm"),
+            os.path.join(example_data, "rtdose.dcm"), [8, 5],
+            memmap_rtdose=True, workers=2)
+        for key, dvh in dvhs.items():
+            assert_array_equal(memmap_dvhs[key].counts, dvh.counts)
+
+    def test_dvh_calculation_rasterizers(self):
+        """Test if the scanline and matplotlib rasterizers are identical."""
+        for key in [6, 8]:
+            scanline = dvhcalc.get_dvh(self.rtss.ds, self.rtdose.ds, key)
+            mpl = dvhcalc.get_dvh(
+                self.rtss.ds, self.rtdose.ds, key, rasterizer='matplotlib')
+            assert_array_equal(scanline.counts, mpl.counts)
+            assert_array_equal(scanline.bins, mpl.bins)
+
+        with self.assertRaises(AttributeError):
+            dvhcalc.get_dvh(
+                self.rtss.ds, self.rtdose.ds, 8, rasterizer='shapely')
+
+    def test_contour_mask_bounding_box(self):
+        """Test if a contour mask matches testing the full dose grid."""
+        dd = self.rtdose.GetDoseData()
+        dosegridpoints = dvhcalc.get_dose_grid_points(dd)
+        plane = self.rtss.GetStructureCoordinates(8)['-14.440']
+        contour = [x[0:2] for x in plane[0]['data']]
+        mask = dvhcalc.get_contour_mask(dd, None, dosegridpoints, contour)
+        expected = Path(contour).contains_points(dosegridpoints).reshape(
+            (dd['rows'], dd['columns']))
+        self.assertTrue(mask.any())
+        assert_array_equal(mask, expected)
+
+        # Contours outside of the dose grid result in an empty mask
+        outside = [[1000, 1000], [1010, 1000], [1010, 1010]]
+        self.assertFalse(
+            dvhcalc.get_contour_mask(dd, None, dosegridpoints, outside).any())
+
+    def test_contour_dvh_histogram(self):
+        """Test if the contour DVH is bin identical to numpy.histogram."""
+        rng = random.default_rng(42)
+        dd = {'dosegridscaling': 1.4e-05,
+              'lut': (arange(0, 10, 2.5), arange(0, 10, 2.5))}
+        structure = {'thickness': 3}
+        doseplane = rng.integers(0, 1000000, (129, 194)).astype(uint32)
+        # Include doses exactly at, and above the maximum dose bin
+        doseplane[0, 0:3] = [0, 500 / 1.4e-03, 1000000]
+        mask = rng.random((129, 194)) > 0.3
+        mask[0, 0:3] = True
+        for maxdose in [1, 500, 1401]:
+            hist, vol = dvhcalc.calculate_contour_dvh(
+                mask, doseplane, maxdose, dd, None, structure)
+            masked = ma.array(
+                doseplane * dd['dosegridscaling'] * 100, mask=~mask)
+            expected, _ = histogram(
+                masked.compressed(), bins=maxdose, range=(0, maxdose))
+            assert_array_equal(hist, expected)
+            self.assertAlmostEqual(vol, expected.sum() * 2.5 * 2.5 * 3)
+
+    def test_plane_histograms(self):
+        """Test if the plane histograms sum to the calculated DVH."""
+        structure = self.rtss.GetStructures()[8]
+        structure['planes'] = self.rtss.GetStructureCoordinates(8)
+        structure['thickness'] = \
+            self.rtss.CalculatePlaneThickness(structure['planes'])
+        planes = list(dvhcalc.calculate_plane_histograms(
+            structure, self.rtdose))
+        self.assertEqual(
+            [p.z for p in planes], sorted(structure['planes'].keys()))
+        hist = sum(p.histogram for p in planes)
+        volume = sum(p.volume for p in planes) / 1000
+        dvh = self.calc_dvh(8)
+        self.assertAlmostEqual(volume, dvh.volume)
+        assert_allclose(
+            trim_zeros(hist * volume / hist.sum(), trim='b'),
+            dvh.differential.counts)
+
     def test_dvh_calculation_memmap(self):
         """Test if DVHs can be calculated with memmapped RT Dose."""
         dvh = dvhcalc.get_dvh(os.path.join(
@@ -550,6 +653,18 @@ class TestDVHCalcDecubitus(unittest.TestCase):
         got_counts = diffl.counts * 18 / 0.36
         assert_allclose(got_counts, expected_counts)
 
+    def test_decubitus_rasterizers(self):
+        """Test scanline and matplotlib rasterizers for decubitus doses."""
+        self.dose.ImageOrientationPatient = [0, -1, 0, -1, 0, 0]
+        self.dose.PixelSpacing = [2.0, 1.0]  # between Rows, Columns
+        self.dose.ImagePositionPatient = [14, 19, 20]  # X Y Z top left
+        for extents in [False, True]:
+            scanline = get_dvh(
+                self.ss, self.dose, 1, use_structure_extents=extents)
+            mpl = get_dvh(self.ss, self.dose, 1, rasterizer='matplotlib',
+                          use_structure_extents=extents)
+            assert_array_equal(scanline.counts, mpl.counts)
+
     def test_empty_dose_grid(self):
         """Test empty dose grid handled correctly."""
         # See #274, prior to fixes this raised IndexError from
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""unittest cases for indexer."""
+# test_indexer.py
+# Copyright (c) 2026 dicompyler-core contributors
+
+
+import unittest
+import os
+import shutil
+import tempfile
+from dicompylercore import indexer
+
+basedata_dir = "tests/testdata"
+example_data = os.path.join(basedata_dir, "example_data")
+
+rtplan_uid = '1.2.246.352.71.5.320687012.24189.20090603083342'
+rtss_uid = '1.2.246.352.71.4.320687012.3190.20090511122144'
+ct_series_uid = '2.16.840.1.113662.2.12.0.3057.1241703565.43'
+
+
+class TestIndexer(unittest.TestCase):
+    """Unit tests for the DICOM directory indexer."""
+
+    def setUp(self):
+        """Copy the example data to a temporary directory to be indexed."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.datadir = os.path.join(self.tmpdir, "data")
+        shutil.copytree(example_data, self.datadir)
+        with open(os.path.join(self.datadir, "readme.txt"), "w") as f:
+            f.write("Not a DICOM file")
+        self.index = indexer.DicomIndex(os.path.join(self.tmpdir, "index.db"))
+
+    def tearDown(self):
+        """Close the index and remove the temporary directory."""
+        self.index.close()
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, filename):
+        """Return the absolute path of a file in the indexed directory."""
+        return os.path.abspath(os.path.join(self.datadir, filename))
+
+    def test_read_header(self):
+        """Test if the header of a DICOM file can be read."""
+        header = indexer.read_header(self.path("rtss.dcm"))
+        self.assertEqual(header['sop_class'], 'rtss')
+        self.assertEqual(header['sop_instance_uid'], rtss_uid)
+        self.assertEqual(header['references']['series'], ct_series_uid)
+        self.assertIsNone(indexer.read_header(self.path("readme.txt")))
+
+    def test_index(self):
+        """Test if a directory can be indexed."""
+        counts = self.index.update(self.datadir, workers=2)
+        self.assertEqual(
+            counts,
+            {'added': 5, 'updated': 0, 'removed': 0, 'unchanged': 0})
+        self.assertEqual(len(self.index.get_patients()), 1)
+        self.assertEqual(len(self.index.get_studies('123456')), 1)
+        self.assertEqual(
+            [s['modality'] for s in self.index.get_series()],
+            ['RTSTRUCT', 'RTPLAN', 'RTDOSE', 'CT'])
+        self.assertEqual(len(self.index.get_files()), 4)
+        self.assertEqual(
+            [f['path'] for f in self.index.get_files(sop_class='ct')],
+            [self.path("ct.0.dcm")])
+
+    def test_plan_files(self):
+        """Test if the files associated with an RT Plan can be queried."""
+        self.index.update(self.datadir)
+        self.assertEqual(
+            self.index.get_plan_files(rtplan_uid),
+            {'rtplan': self.path("rtplan.dcm"),
+             'rtss': self.path("rtss.dcm"),
+             'images': [self.path("ct.0.dcm")],
+             'rtdose': [self.path("rtdose.dcm")]})
+        self.assertEqual(
+            self.index.get_referencing_files(rtss_uid),
+            [self.path("rtdose.dcm"), self.path("rtplan.dcm")])
+
+    def test_incremental_update(self):
+        """Test if only modified files are read when updating the index."""
+        self.index.update(self.datadir)
+        self.assertEqual(
+            self.index.update(self.datadir),
+            {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 5})
+        os.utime(self.path("rtdose.dcm"), (0, 0))
+        os.remove(self.path("ct.0.dcm"))
+        self.assertEqual(
+            self.index.update(self.datadir),
+            {'added': 0, 'updated': 1, 'removed': 1, 'unchanged': 3})
+        self.assertEqual(
+            self.index.get_plan_files(rtplan_uid)['rtdose'],
+            [self.path("rtdose.dcm")])
+        # The CT series is removed once it no longer contains files
+        self.assertEqual(self.index.get_series(modality='CT'), [])
+        # The index is persisted in the database
+        self.index.close()
+        self.index = indexer.DicomIndex(os.path.join(self.tmpdir, "index.db"))
+        self.assertEqual(len(self.index.get_files()), 3)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(unittest.main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""unittest cases for series."""
+# test_series.py
+# Copyright (c) 2026 dicompyler-core contributors
+
+
+import unittest
+import os
+import shutil
+import tempfile
+from dicompylercore import dicomparser, series
+from dicompylercore.config import pil_available
+from pydicom import dcmread
+from pydicom.uid import generate_uid
+from numpy import asarray, float32, int16, memmap, uint8
+from numpy.testing import assert_array_equal, assert_array_almost_equal
+
+basedata_dir = "tests/testdata"
+example_data = os.path.join(basedata_dir, "example_data")
+
+
+class TestImageSeries(unittest.TestCase):
+    """Unit tests for the ImageSeries class."""
+
+    def setUp(self):
+        """Create a CT series of 3 slices in a temporary directory."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.ds = dcmread(os.path.join(example_data, "ct.0.dcm"))
+        self.pixel_array = self.ds.pixel_array
+        self.files = []
+        # Save the slices in reverse order of their image location
+        for i in range(3):
+            ds = dcmread(os.path.join(example_data, "ct.0.dcm"))
+            ds.SOPInstanceUID = generate_uid()
+            ds.ImagePositionPatient[2] = 168.5593 - 3 * i
+            ds.PixelData = (ds.pixel_array + i).tobytes()
+            self.files.append(os.path.join(self.tmpdir, "ct.%d.dcm" % i))
+            ds.save_as(self.files[-1])
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.tmpdir)
+
+    def test_volume(self):
+        """Test if the image volume is sorted by image location."""
+        s = series.ImageSeries(self.files, workers=2)
+        self.assertEqual(s.shape, (3, 512, 512))
+        self.assertEqual(s.volume.dtype, float32)
+        self.assertEqual(s.files, self.files[::-1])
+        assert_array_almost_equal(s.locations, [162.5593, 165.5593, 168.5593])
+        self.assertAlmostEqual(s.slice_spacing, 3)
+        for i in range(3):
+            assert_array_equal(s.volume[i], self.pixel_array + 2 - i)
+
+    def test_rescale(self):
+        """Test if the rescale slope & intercept are applied per slice."""
+        ds = dcmread(self.files[0])
+        ds.RescaleSlope = 2
+        ds.RescaleIntercept = -1024
+        ds.save_as(self.files[0])
+        s = series.ImageSeries(self.files)
+        assert_array_equal(s.volume[2], self.pixel_array * 2 - 1024)
+        assert_array_equal(s.volume[1], self.pixel_array + 1)
+        s = series.ImageSeries(self.files, dtype=int16)
+        self.assertEqual(s.volume.dtype, int16)
+        assert_array_equal(s.volume[2], self.pixel_array * 2 - 1024)
+        # Non-integer rescale parameters can't be stored in an integer volume
+        ds.RescaleSlope = 2.5
+        ds.save_as(self.files[0])
+        with self.assertRaises(AttributeError):
+            series.ImageSeries(self.files, dtype=int16)
+
+    def test_mismatched_geometry(self):
+        """Test if slices with mismatched geometry are detected."""
+        ds = dcmread(self.files[1])
+        ds.PixelSpacing = [2, 2]
+        ds.save_as(self.files[1])
+        with self.assertRaises(NotImplementedError):
+            series.ImageSeries(self.files)
+        ds.PixelSpacing = self.ds.PixelSpacing
+        ds.ImagePositionPatient[2] = 168.5593
+        ds.save_as(self.files[1])
+        with self.assertRaises(NotImplementedError):
+            series.ImageSeries(self.files)
+
+    def test_cache(self):
+        """Test if the image volume can be loaded from a memmapped cache."""
+        cache = os.path.join(self.tmpdir, "volume.npy")
+        s = series.ImageSeries(self.files, cache=cache)
+        cached = series.ImageSeries(self.files[::-1], cache=cache)
+        self.assertIsInstance(cached.volume, memmap)
+        assert_array_equal(cached.volume, s.volume)
+        self.assertEqual(cached.files, s.files)
+        self.assertEqual(cached.pixelspacing, s.pixelspacing)
+        # The cache is rebuilt if a slice is modified
+        ds = dcmread(self.files[0])
+        ds.RescaleIntercept = -1024
+        ds.save_as(self.files[0])
+        os.utime(self.files[0], (0, 0))
+        del s, cached
+        s = series.ImageSeries(self.files, cache=cache)
+        assert_array_equal(s.volume[2], self.pixel_array - 1024)
+
+    def test_render(self):
+        """Test if the volume can be rendered as an 8-bit image stack."""
+        s = series.ImageSeries(self.files, dtype=int16)
+        images = s.render(400, 40)
+        self.assertEqual(images.dtype, uint8)
+        self.assertEqual(images.shape, (3, 512, 512))
+        for image, f in zip(images, s.files):
+            if pil_available:
+                assert_array_equal(
+                    image, asarray(dicomparser.DicomParser(f).GetImage(
+                        400, 40)))
+        # Floating point volumes are rendered without a LUT
+        float_images = series.ImageSeries(self.files).render(400, 40)
+        assert_array_equal(float_images, images)
+        # Render a subset of slices to a memmapped file
+        out = os.path.join(self.tmpdir, "images.npy")
+        strided = s.render(stride=2, out=out)
+        self.assertIsInstance(strided, memmap)
+        self.assertEqual(strided.shape, (2, 512, 512))
+        assert_array_equal(strided[1], s.render()[2])
+
+    @unittest.skipUnless(pil_available, "PIL not installed")
+    def test_export_images(self):
+        """Test if the rendered slices can be exported as PNG images."""
+        s = series.ImageSeries(self.files)
+        filenames = s.export_images(
+            self.tmpdir, 400, 40, stride=2, size=(128, 128), workers=2)
+        self.assertEqual(
+            filenames, [os.path.join(self.tmpdir, "0000.png"),
+                        os.path.join(self.tmpdir, "0002.png")])
+        from PIL import Image
+        with Image.open(filenames[1]) as im:
+            self.assertEqual(im.size, (128, 128))
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(unittest.main())
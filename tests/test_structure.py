@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""unittest cases for structure."""
+# test_structure.py
+# Copyright (c) 2026 dicompyler-core contributors
+
+
+import unittest
+import os
+import pickle
+from dicompylercore import dicomparser, dvhcalc
+from dicompylercore.structure import StructureGeometry, parse_contour_data
+from numpy import float64, shares_memory
+from numpy.testing import assert_array_equal, assert_array_almost_equal
+
+basedata_dir = "tests/testdata"
+example_data = os.path.join(basedata_dir, "example_data")
+
+
+class TestStructureGeometry(unittest.TestCase):
+    """Unit tests for the StructureGeometry class."""
+
+    def setUp(self):
+        """Setup the RT Structure Set used for testing."""
+        self.dp = dicomparser.DicomParser(
+            os.path.join(example_data, "rtss.dcm"))
+
+    def test_geometry(self):
+        """Test if the contours are stored in contiguous arrays."""
+        geometry = self.dp.GetStructureGeometry(5)
+        self.assertEqual(geometry.points.dtype, float64)
+        self.assertEqual(geometry.points.shape, (geometry.offsets[-1], 3))
+        self.assertEqual(len(geometry.types), len(geometry.offsets) - 1)
+        self.assertEqual(len(geometry.bounds), len(geometry.types))
+        # Planes are keyed by float slice position and contain point arrays
+        plane = geometry[-47.44]
+        self.assertTrue(shares_memory(plane[0], geometry.points))
+        assert_array_almost_equal(plane[0][0], (2.69, -313.11, -47.44))
+        # String slice positions of GetStructureCoordinates are also accepted
+        self.assertEqual(len(geometry['-47.440']), len(plane))
+        self.assertNotIn('invalid', geometry)
+        self.assertEqual(len(self.dp.GetStructureGeometry(100)), 0)
+
+    def test_coordinates_adapter(self):
+        """Test if the geometry can be converted to the dict format."""
+        geometry = self.dp.GetStructureGeometry(8)
+        planes = geometry.to_dict()
+        self.assertEqual(planes, self.dp.GetStructureCoordinates(8))
+        self.assertEqual(sorted(float(z) for z in planes), sorted(geometry))
+        contour = planes['-14.440'][0]
+        self.assertEqual(contour['type'], 'CLOSED_PLANAR')
+        self.assertEqual(contour['num_points'], len(contour['data']))
+        # Round trip the dict format
+        converted = StructureGeometry.from_dict(planes)
+        assert_array_equal(converted.points, geometry.points)
+        assert_array_equal(converted.offsets, geometry.offsets)
+        self.assertEqual(converted.types, geometry.types)
+
+    def test_extents(self):
+        """Test if the extents are determined from the contour bounds."""
+        geometry = self.dp.GetStructureGeometry(8)
+        self.assertEqual(
+            geometry.extents(),
+            dvhcalc.structure_extents(geometry.to_dict()))
+        contour = geometry['-14.440'][0]
+        assert_array_equal(
+            geometry.bounds[geometry.planes[-14.44][0]],
+            [contour[:, 0].min(), contour[:, 1].min(),
+             contour[:, 0].max(), contour[:, 1].max()])
+
+    def test_geometries(self):
+        """Test if the geometry of all structures is parsed in one pass."""
+        geometries = self.dp.GetStructureGeometries()
+        self.assertEqual(sorted(geometries), list(range(1, 11)))
+        for number, geometry in geometries.items():
+            self.assertEqual(geometry.to_dict(),
+                             self.dp.GetStructureCoordinates(number))
+        # ROIs without contour data have an empty geometry
+        geometries = self.dp.GetStructureGeometries([5, 100])
+        self.assertEqual(sorted(geometries), [5, 100])
+        self.assertEqual(len(geometries[100]), 0)
+
+    def test_raw_contour_data(self):
+        """Test if ContourData parsed from raw values equals pydicom's."""
+        geometries = self.dp.GetStructureGeometries()
+        expected = dicomparser.DicomParser(
+            os.path.join(example_data, "rtss.dcm")).GetStructureGeometries(
+                raw=False)
+        for number, geometry in geometries.items():
+            assert_array_equal(geometry.points, expected[number].points)
+            assert_array_equal(geometry.offsets, expected[number].offsets)
+        assert_array_equal(
+            parse_contour_data(b'1.5\\-2\\3e1 \\4\\5\\6 '),
+            [[1.5, -2, 30], [4, 5, 6]])
+        self.assertEqual(parse_contour_data(b' ').shape, (0, 3))
+        with self.assertRaises(ValueError):
+            parse_contour_data(b'1\\x\\3')
+        with self.assertRaises(ValueError):
+            parse_contour_data(b'1\\2')
+
+    def test_volume(self):
+        """Test if nested contours are subtracted from the volume."""
+        def square(xmin, xmax, z=0):
+            return ('CLOSED_PLANAR', [[xmin, xmin, z], [xmax, xmin, z],
+                                      [xmax, xmax, z], [xmin, xmax, z]])
+        # Two squares with holes, where the first hole contains an island
+        geometry = StructureGeometry.from_contours([
+            square(0, 10), square(2, 8), square(4, 6),
+            square(20, 30), square(22, 28)])
+        assert_array_almost_equal(geometry.areas(), [100, 36, 4, 100, 36])
+        assert_array_equal(geometry.nesting_depths(), [0, 1, 2, 0, 1])
+        self.assertAlmostEqual(geometry.volume(1), 0.132)
+        # The first and last planes contribute half of their area
+        geometry = StructureGeometry.from_contours(
+            [square(0, 10, z) for z in (0, 2, 4)])
+        self.assertAlmostEqual(geometry.volume(2), 0.4)
+        self.assertEqual(StructureGeometry().volume(2), 0)
+
+    def test_pickle(self):
+        """Test if the geometry can be pickled for DVH worker processes."""
+        geometry = self.dp.GetStructureGeometry(5)
+        unpickled = pickle.loads(pickle.dumps(geometry))
+        assert_array_equal(unpickled.points, geometry.points)
+        self.assertEqual(unpickled.planes, geometry.planes)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(unittest.main())